@@ -0,0 +1,203 @@
+"""Асинхронные обработчики самых частых GET-запросов API.
+
+Работают под ASGI-сервером (настройка ASYNC_READ_VIEWS) и используют
+асинхронный ORM Django. Ответы совпадают с ответами вьюсетов: на тех же
+адресах остальные методы, а также ошибки (неверный токен, фильтр или
+страница, отсутствующий объект, не-JSON ответ) обрабатывает синхронный
+вьюсет.
+"""
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from foodgram_backend.cache import is_shared_cache
+from recipes.ingredient_index import ingredient_index
+
+from .authentication import JWTAuthentication
+from .views import IngredientViewSet, RecipeViewSet
+
+
+class Fallback(Exception):
+    """Запрос должен обработать синхронный вьюсет."""
+
+
+async def authenticate(request):
+    """Пользователь и токен по заголовку Authorization,
+    как в JWTAuthentication и TokenAuthentication."""
+    # APIClient.force_authenticate(), как в rest_framework.request.Request.
+    force_user = getattr(request, '_force_auth_user', None)
+    force_token = getattr(request, '_force_auth_token', None)
+    if force_user is not None or force_token is not None:
+        return force_user, force_token
+    auth = get_authorization_header(request).split()
+    if not auth:
+        return AnonymousUser(), None
+    if settings.JWT_AUTH:
+        # При промахе кеша версий токенов читается база.
+        result = await sync_to_async(JWTAuthentication().authenticate)(
+            request
+        )
+        if result is not None:
+            return result
+    if (
+        auth[0].lower() != TokenAuthentication.keyword.lower().encode()
+        or len(auth) != 2
+    ):
+        raise Fallback
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise Fallback
+    token = await Token.objects.select_related('user').filter(
+        key=key
+    ).afirst()
+    if token is None or not token.user.is_active:
+        raise Fallback
+    return token.user, token
+
+
+async def init_view(viewset, actions, initkwargs, request, args, kwargs):
+    """Экземпляр вьюсета, подготовленный так же, как в as_view()
+    и APIView.dispatch(), но с асинхронной аутентификацией."""
+    user, token = await authenticate(request)
+    view = viewset(**initkwargs)
+    view.action_map = actions
+    for method, action in actions.items():
+        setattr(view, method, getattr(view, action))
+    view.args = args
+    view.kwargs = kwargs
+    request = view.initialize_request(request, *args, **kwargs)
+    request.user = user
+    request.auth = token
+    view.request = request
+    view.headers = view.default_response_headers
+    view.initial(request)
+    if not isinstance(request.accepted_renderer, JSONRenderer):
+        raise Fallback
+    return view
+
+
+def async_view(viewset, actions, handler, **initkwargs):
+    """Представление для адреса вьюсета: GET обрабатывает асинхронный
+    handler(view, request, **kwargs), остальное — синхронный вьюсет.
+
+    Атрибуты cls и actions такие же, как у представлений DRF, поэтому
+    бюджеты запросов (query_budgets) действуют и здесь.
+    """
+    actions = {'head': actions['get'], **actions}
+    sync_view = sync_to_async(viewset.as_view(actions, **initkwargs))
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            try:
+                drf_view = await init_view(
+                    viewset, actions, initkwargs, request, args, kwargs
+                )
+                response = await handler(
+                    drf_view, drf_view.request, **kwargs
+                )
+            except (Fallback, APIException):
+                pass
+            else:
+                response = drf_view.finalize_response(
+                    drf_view.request, response
+                )
+                if isinstance(response, Response):
+                    response.render()
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    view.cls = viewset
+    view.actions = actions
+    view.initkwargs = initkwargs
+    view.csrf_exempt = True
+    return view
+
+
+async def filter_queryset(view, request):
+    """view.filter_queryset(); фильтр по тегам читает tag_map (а при
+    смене версии тегов — базу) синхронно, поэтому в отдельном потоке."""
+    if 'tags' in request.query_params:
+        return await sync_to_async(view.filter_queryset)(
+            view.get_queryset()
+        )
+    return view.filter_queryset(view.get_queryset())
+
+
+async def list_recipes(view, request):
+    queryset = await filter_queryset(view, request)
+    page = await view.paginator.apaginate_queryset(queryset, request, view)
+    return view.paginator.get_paginated_response(
+        view.get_serializer(page, many=True).data
+    )
+
+
+async def retrieve_recipe(view, request, pk):
+    try:
+        queryset = await filter_queryset(view, request)
+        instance = await queryset.filter(pk=pk).afirst()
+    except (TypeError, ValueError, ValidationError):
+        raise Fallback
+    if instance is None:
+        raise Fallback
+    view.check_object_permissions(request, instance)
+    return Response(view.get_serializer(instance).data)
+
+
+async def search_ingredients(view, request):
+    await ingredient_index.aget()
+    return view.search(request)
+
+
+async def recipe_list(view, request):
+    return await view.aconditional_response(
+        partial(view.acached_response, partial(list_recipes, view)),
+        request
+    )
+
+
+async def recipe_detail(view, request, pk):
+    return await view.aconditional_response(
+        partial(view.acached_response, partial(retrieve_recipe, view)),
+        request, pk=pk
+    )
+
+
+async def ingredient_list(view, request):
+    """Асинхронно обслуживается только автодополнение (?name=)
+    по индексу в памяти, то есть при общем кеше."""
+    if not request.query_params.get('name') or not is_shared_cache():
+        raise Fallback
+    return await view.aconditional_response(
+        partial(search_ingredients, view), request
+    )
+
+
+recipes_list_view = async_view(
+    RecipeViewSet, {'get': 'list', 'post': 'create'}, recipe_list,
+    basename='recipes', detail=False, suffix='List'
+)
+recipes_detail_view = async_view(
+    RecipeViewSet,
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+    recipe_detail,
+    basename='recipes', detail=True, suffix='Instance'
+)
+ingredients_list_view = async_view(
+    IngredientViewSet, {'get': 'list'}, ingredient_list,
+    basename='ingredients', detail=False, suffix='List'
+)
@@ -0,0 +1,60 @@
+"""Аутентификация по JWT (настройка JWT_AUTH).
+
+Токен доступа содержит id пользователя и версию его токенов
+(users.tokens), поэтому пользователь определяется без запроса к базе:
+его поля загружаются одним запросом только при первом обращении к ним.
+"""
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.tokens import get_token_version
+
+VERSION_CLAIM = 'ver'
+
+User = get_user_model()
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Токен обновления с версией токенов пользователя; выпущенные
+    из него токены доступа получают ту же версию."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[VERSION_CLAIM] = get_token_version(user.pk)
+        return token
+
+
+def check_version(token):
+    """Отклоняет токен, отозванный выходом или сменой пароля."""
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Токен не содержит id пользователя.')
+    if token.get(VERSION_CLAIM) != get_token_version(user_id):
+        raise AuthenticationFailed('Токен отозван.', code='token_revoked')
+    return user_id
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """JWT в заголовке Authorization: Token <jwt> или Bearer <jwt>.
+
+    Ключи TokenAuthentication (без точек) пропускаются и проверяются
+    следующим классом аутентификации.
+    """
+
+    def get_raw_token(self, header):
+        raw_token = super().get_raw_token(header)
+        if raw_token is None or raw_token.count(b'.') != 2:
+            return None
+        return raw_token
+
+    def get_user(self, validated_token):
+        return User.from_db(
+            DEFAULT_DB_ALIAS, ['id'], [check_version(validated_token)]
+        )
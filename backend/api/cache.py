@@ -0,0 +1,53 @@
+import threading
+from hashlib import sha1
+
+from django.core.cache import cache
+
+from recipes.metrics import count_cache
+
+from .constants import RESPONSE_CACHE_TIMEOUT
+
+
+class ResponseCache:
+    """Кеш данных ответов API с подсчетом попаданий и промахов.
+
+    В ключ входят версии данных (см. recipes.versions): после изменения
+    версии старые записи больше не читаются и вытесняются по таймауту.
+    """
+
+    def __init__(self, prefix, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, request, versions):
+        params = sorted(
+            (name, sorted(value for value in values if value))
+            for name, values in request.query_params.lists()
+        )
+        raw = repr((
+            request.get_host(),
+            request.path,
+            [(name, values) for name, values in params if values],
+            versions,
+        ))
+        return f'response:{self.prefix}:{sha1(raw.encode()).hexdigest()}'
+
+    def get(self, key):
+        data = cache.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        hit = data is not None
+        count_cache(f'response:{self.prefix}', hits=hit, misses=not hit)
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, self.timeout)
+
+
+recipes_response_cache = ResponseCache('recipes', RESPONSE_CACHE_TIMEOUT)
@@ -1 +1,7 @@
 DEFAULT_PAGES_LIMIT = 6
+SHOPPING_CART_CHUNK_SIZE = 500
+SHOPPING_CART_FILENAME = 'shopping_cart'
+INGREDIENTS_SEARCH_LIMIT = 50
+MAX_PAGES_LIMIT = 100
+RESPONSE_CACHE_TIMEOUT = 300
+MAX_BATCH_RECIPES = 100
@@ -1,6 +1,9 @@
+from django import forms
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Favorites, Ingredient, Recipe, ShoppingCart
+from recipes.tag_map import tag_map
 
 
 class IngredientFilter(filters.FilterSet):
@@ -15,32 +18,51 @@ class IngredientFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    """Фильтр рецептов."""
+    """Фильтр рецептов.
+
+    Каждое условие — отдельный полусоединение EXISTS по индексу,
+    поэтому строки рецептов не дублируются и DISTINCT не нужен.
+    """
     author = filters.NumberFilter(field_name='author')
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+    tags = filters.Filter(
+        method='filter_by_tags', widget=forms.SelectMultiple
     )
     is_favorited = filters.BooleanFilter(method='filter_by_is_favorite')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_by_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_by_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search'
+        )
+
+    def filter_by_tags(self, queryset, name, value):
+        """Получаем рецепты хотя бы с одним из тегов (по слагам)."""
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=tag_map.ids(value)
+        )))
 
     def filter_by_is_favorite(self, queryset, name, value):
         """Получаем рецепты из избранного."""
         if value and self.request.user.is_authenticated:
-            return queryset.filter(
-                favorites__user=self.request.user
-            )
+            return queryset.filter(Exists(Favorites.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
 
     def filter_by_is_in_shopping_cart(self, queryset, name, value):
         """Получаем рецепты из списка покупок."""
         if value and self.request.user.is_authenticated:
-            return queryset.filter(
-                shopping_cart__user=self.request.user
-            )
+            return queryset.filter(Exists(ShoppingCart.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
+
+    def filter_by_search(self, queryset, name, value):
+        """Полнотекстовый поиск, сначала самые релевантные рецепты."""
+        return queryset.search(value).order_by(
+            '-search_rank', *Recipe._meta.ordering, '-id'
+        )
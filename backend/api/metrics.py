@@ -0,0 +1,80 @@
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram
+from prometheus_client.exposition import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50, 100)
+QUERY_TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+SIZE_BUCKETS = tuple(256 * 4 ** power for power in range(8))
+
+request_latency = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса',
+    ['route', 'method', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+db_queries = Histogram(
+    'foodgram_db_queries_per_request',
+    'Число SQL-запросов за один запрос к приложению',
+    ['route'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_time = Histogram(
+    'foodgram_db_time_per_request_seconds',
+    'Суммарное время SQL-запросов за один запрос к приложению',
+    ['route'],
+    buckets=QUERY_TIME_BUCKETS,
+)
+response_size = Histogram(
+    'foodgram_http_response_size_bytes',
+    'Размер тела ответа',
+    ['route'],
+    buckets=SIZE_BUCKETS,
+)
+
+
+def get_route(request):
+    """Имя маршрута вместо пути, чтобы число рядов метрик не зависело
+    от id в адресах."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+def get_registry():
+    """При нескольких процессах gunicorn метрики собираются из файлов
+    в PROMETHEUS_MULTIPROC_DIR, которые пишут все рабочие процессы."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+def has_access(request):
+    """Доступ для персонала или по внутреннему токену
+    (заголовок Authorization: Bearer <METRICS_TOKEN>)."""
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode()
+    )
+
+
+def metrics(request):
+    """Метрики в текстовом формате Prometheus."""
+    if not has_access(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,252 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from hashlib import sha1
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.authentication import get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram_backend.cache import is_shared_cache, state_cache
+from foodgram_backend.db_router import replica_reads
+
+from .metrics import (db_queries, db_time, get_route, request_latency,
+                      response_size)
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_SQL_LENGTH = 300
+PIN_COOKIE = 'db_pin'
+
+
+class QueryBudgetExceeded(Exception):
+    """Запрос выполнил больше SQL-запросов, чем разрешает бюджет вьюсета."""
+
+
+class QueryStats:
+    """Число, суммарное время и самый медленный из SQL-запросов,
+    прошедших через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if self.slowest_sql is None or duration > self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+
+
+def get_query_budget(request, view_func):
+    """Бюджет из атрибута query_budgets вьюсета DRF для текущего
+    действия ({'list': 10, ...}) или None."""
+    budgets = getattr(getattr(view_func, 'cls', None), 'query_budgets', None)
+    actions = getattr(view_func, 'actions', None)
+    if not budgets or not actions:
+        return None
+    return budgets.get(actions.get(request.method.lower()))
+
+
+def track_queries(stats):
+    """Подключает stats ко всем соединениям текущего потока;
+    close() у результата отключает."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+    return stack
+
+
+class QueryStatsMiddleware:
+    """Основа middleware, которым нужны QueryStats и длительность
+    запроса. Работает в синхронной и асинхронной цепочке: в асинхронной
+    запросы к базе выполняются в потоке sync_to_async, поэтому обертки
+    подключаются к соединениям этого потока.
+    """
+    sync_capable = True
+    async_capable = True
+    enabled_setting = None
+
+    def __init__(self, get_response):
+        if not getattr(settings, self.enabled_setting):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        started = time.perf_counter()
+        with track_queries(stats):
+            response = self.get_response(request)
+        return self.process(
+            request, response, stats, time.perf_counter() - started
+        )
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        tracking = await sync_to_async(track_queries)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(tracking.close)()
+        return self.process(
+            request, response, stats, time.perf_counter() - started
+        )
+
+    def process(self, request, response, stats, duration):
+        raise NotImplementedError
+
+
+class SQLInstrumentationMiddleware(QueryStatsMiddleware):
+    """Учет SQL-запросов каждого запроса к приложению.
+
+    Добавляет заголовок Server-Timing, пишет строку лога в формате JSON
+    и проверяет бюджет запросов вьюсета: при превышении пишет
+    предупреждение или, если SQL_QUERY_BUDGET_RAISE, выбрасывает
+    QueryBudgetExceeded. Когда SQL_INSTRUMENTATION выключен, Django
+    не включает middleware в цепочку.
+    """
+    enabled_setting = 'SQL_INSTRUMENTATION'
+
+    def process(self, request, response, stats, duration):
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.2f};'
+            f'desc="{stats.count} queries"'
+        )
+        budget = getattr(request, 'query_budget', None)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'budget': budget,
+            'db_ms': round(stats.duration * 1000, 2),
+            'slowest_ms': round(stats.slowest_duration * 1000, 2),
+            'slowest_sql': (stats.slowest_sql or '')[:SLOWEST_SQL_LENGTH],
+        }, ensure_ascii=False))
+        if budget is not None and stats.count > budget:
+            message = (
+                f'{request.method} {request.path}: {stats.count} SQL-запросов '
+                f'при бюджете {budget}'
+            )
+            if settings.SQL_QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(request, view_func)
+
+
+class MetricsMiddleware(QueryStatsMiddleware):
+    """Метрики Prometheus по каждому запросу: время обработки, число
+    и время SQL-запросов, размер ответа (см. api.metrics).
+
+    Отключается настройкой METRICS_ENABLED.
+    """
+    enabled_setting = 'METRICS_ENABLED'
+
+    def process(self, request, response, stats, duration):
+        route = get_route(request)
+        request_latency.labels(
+            route, request.method, response.status_code
+        ).observe(duration)
+        db_queries.labels(route).observe(stats.count)
+        db_time.labels(route).observe(stats.duration)
+        size = (
+            response.get('Content-Length') if response.streaming
+            else len(response.content)
+        )
+        if size is not None:
+            response_size.labels(route).observe(int(size))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Безопасные запросы к API читают с реплики (REPLICA_DATABASES).
+
+    После небезопасного запроса клиент REPLICA_PIN_SECONDS секунд
+    читает из основной базы, чтобы видеть свои изменения. Клиент
+    узнается по cookie и по заголовку Authorization: токен есть
+    не у всех клиентов, а cookie сохраняют не все. Без реплик Django
+    не включает middleware в цепочку.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.choose_replica(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        """Метки в кеше читаются и записываются в отдельном потоке."""
+        replica = await sync_to_async(self.choose_replica)(request)
+        with replica_reads(replica):
+            response = await self.get_response(request)
+        return await sync_to_async(self.pin)(request, response)
+
+    @staticmethod
+    def pin_key(request):
+        header = get_authorization_header(request)
+        if not header:
+            return None
+        return f'db_pin:{sha1(header).hexdigest()}'
+
+    def is_pinned(self, request):
+        """Без общего кеша (foodgram_backend.cache) метку, записанную
+        другим процессом, не проверить, и клиенты с Authorization всегда
+        читают из основной базы."""
+        key = self.pin_key(request)
+        return PIN_COOKIE in request.COOKIES or (
+            key is not None
+            and (not is_shared_cache() or state_cache.get(key) is not None)
+        )
+
+    def choose_replica(self, request):
+        if (
+            request.method not in SAFE_METHODS
+            or not request.path.startswith(settings.API_URL_PREFIX)
+            or self.is_pinned(request)
+        ):
+            return None
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def pin(self, request, response):
+        if request.method in SAFE_METHODS:
+            return response
+        window = settings.REPLICA_PIN_SECONDS
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=window, httponly=True, samesite='Lax'
+        )
+        key = self.pin_key(request)
+        if key is not None:
+            state_cache.set(key, True, window)
+        return response
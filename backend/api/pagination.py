@@ -1,8 +1,255 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-from .constants import DEFAULT_PAGES_LIMIT
+from .constants import DEFAULT_PAGES_LIMIT, MAX_PAGES_LIMIT
 
 
 class RecipesPagination(PageNumberPagination):
+    """Постраничная пагинация с двумя дополнительными режимами.
+
+    ?count=false — страница без запроса COUNT(*) (count в ответе null);
+    ?cursor= — пагинация по ключу cursor_ordering вместо OFFSET.
+    """
     page_size_query_param = 'limit'
     page_size = DEFAULT_PAGES_LIMIT
+    max_page_size = MAX_PAGES_LIMIT
+    count_query_param = 'count'
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def set_mode(self, request):
+        self.request = request
+        self.mode = 'pages'
+        if self.cursor_query_param in request.query_params:
+            self.mode = 'cursor'
+        elif request.query_params.get(self.count_query_param) == 'false':
+            self.mode = 'no_count'
+        return self.mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = self.set_mode(request)
+        if mode == 'cursor':
+            rows, *page_args = self.cursor_query(queryset, request)
+            return self.cursor_page(list(rows), *page_args)
+        if mode == 'no_count':
+            rows, *page_args = self.no_count_query(queryset, request)
+            return self.no_count_page(list(rows), *page_args)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset для api.async_views."""
+        mode = self.set_mode(request)
+        if mode == 'cursor':
+            rows, *page_args = self.cursor_query(queryset, request)
+            return self.cursor_page([row async for row in rows], *page_args)
+        if mode == 'no_count':
+            rows, *page_args = self.no_count_query(queryset, request)
+            return self.no_count_page(
+                [row async for row in rows], *page_args
+            )
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [
+            obj async for obj in self.page.object_list
+        ]
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.mode == 'cursor':
+            return Response({
+                'next': self.next_link,
+                'previous': self.previous_link,
+                'results': data,
+            })
+        if self.mode == 'no_count':
+            return Response({
+                'count': None,
+                'next': self.next_link,
+                'previous': self.previous_link,
+                'results': data,
+            })
+        return super().get_paginated_response(data)
+
+    def no_count_query(self, queryset, request):
+        """Срез из page_size + 1 строк страницы без COUNT(*)."""
+        page_size = self.get_page_size(request)
+        try:
+            page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+        except ValueError:
+            page_number = 0
+        if page_number < 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params[self.page_query_param],
+                message='Неверный номер страницы.'
+            ))
+        offset = (page_number - 1) * page_size
+        return (
+            queryset[offset:offset + page_size + 1], page_size, page_number
+        )
+
+    def no_count_page(self, rows, page_size, page_number):
+        url = self.request.build_absolute_uri()
+        self.next_link = None
+        if len(rows) > page_size:
+            self.next_link = replace_query_param(
+                url, self.page_query_param, page_number + 1
+            )
+        self.previous_link = None
+        if page_number == 2:
+            self.previous_link = remove_query_param(
+                url, self.page_query_param
+            )
+        elif page_number > 2:
+            self.previous_link = replace_query_param(
+                url, self.page_query_param, page_number - 1
+            )
+        return rows[:page_size]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            position, reverse = json.loads(
+                base64.urlsafe_b64decode(encoded.encode()).decode()
+            )
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(position, list)
+            or len(position) != len(self.cursor_ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    def encode_cursor(self, instance, reverse):
+        position = [
+            force_str(self.get_field(instance, field))
+            for field in self.cursor_ordering
+        ]
+        encoded = base64.urlsafe_b64encode(
+            json.dumps((position, reverse)).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded
+        )
+
+    @staticmethod
+    def get_field(instance, field):
+        return getattr(instance, field.lstrip('-'))
+
+    def position_filter(self, queryset, position, reverse, ordering=None):
+        """Условие «строго после position» в порядке ordering
+        (по умолчанию cursor_ordering)."""
+        conditions = []
+        equal = Q()
+        for field, value in zip(ordering or self.cursor_ordering, position):
+            name = field.lstrip('-')
+            try:
+                value = queryset.model._meta.get_field(name).to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            conditions.append(equal & Q(**{f'{name}__{lookup}': value}))
+            equal &= Q(**{name: value})
+        return reduce(or_, conditions)
+
+    @staticmethod
+    def reverse_ordering(ordering):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in ordering
+        )
+
+    def cursor_query(self, queryset, request):
+        """Срез из page_size + 1 строк после курсора."""
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        ordering = self.cursor_ordering
+        if reverse:
+            ordering = self.reverse_ordering(ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.position_filter(queryset, position, reverse)
+            )
+        return queryset[:page_size + 1], page_size, position, reverse
+
+    def cursor_page(self, rows, page_size, position, reverse):
+        """Страница из page_size + 1 строк после курсора и ссылки
+        на соседние страницы."""
+        has_more = len(rows) > page_size
+        page = rows[:page_size]
+        if reverse:
+            page.reverse()
+        self.next_link = self.previous_link = None
+        if page:
+            if has_more or reverse:
+                self.next_link = self.encode_cursor(page[-1], False)
+            if (has_more and reverse) or (position and not reverse):
+                self.previous_link = self.encode_cursor(page[0], True)
+        return page
+
+
+class UsersPagination(RecipesPagination):
+    cursor_ordering = ('username', 'id')
+
+
+class FeedPagination(RecipesPagination):
+    """Курсорная пагинация ленты подписок.
+
+    Лента собирается из нескольких источников (см. recipes.feed):
+    из каждого берется не больше page_size + 1 строк после курсора,
+    строки объединяются без повторов. Страница — список пар
+    (created_at, id рецепта).
+    """
+
+    def paginate_queryset(self, sources, request, view=None):
+        self.request = request
+        self.mode = 'cursor'
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        rows = set()
+        for queryset, id_field in sources:
+            ordering = ('-created_at', f'-{id_field}')
+            queryset = queryset.order_by(*(
+                self.reverse_ordering(ordering) if reverse else ordering
+            ))
+            if position is not None:
+                queryset = queryset.filter(self.position_filter(
+                    queryset, position, reverse, ordering
+                ))
+            rows.update(
+                queryset.values_list('created_at', id_field)[:page_size + 1]
+            )
+        rows = sorted(rows, reverse=not reverse)[:page_size + 1]
+        return self.cursor_page(rows, page_size, position, reverse)
+
+    def get_field(self, row, field):
+        return row[self.cursor_ordering.index(field)]
@@ -1,13 +1,21 @@
 import base64
+from collections.abc import Mapping
 
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.files.base import ContentFile
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt import serializers as jwt_serializers
 
+from api.authentication import VersionedRefreshToken, check_version
+from api.constants import MAX_BATCH_RECIPES
 from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag, UserRecipeBaseModel)
+from recipes.renditions import rendition_urls
+from recipes.versions import RECIPES_VERSION, bump_versions, recipe_version
 from users.models import Follow
 
 User = get_user_model()
@@ -23,6 +31,68 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class ResolvedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который берет объекты из словаря
+    resolved_objects корневого сериализатора, если он заполнен,
+    вместо отдельного запроса на каждый ключ."""
+    def to_internal_value(self, data):
+        resolved = getattr(self.root, 'resolved_objects', None)
+        if resolved is None or self.queryset.model not in resolved:
+            return super().to_internal_value(data)
+        pk = parse_pk(self.queryset.model, data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return resolved[self.queryset.model][pk]
+        except KeyError:
+            # Ключа нет среди загруженных заранее: проверяем обычным
+            # запросом, чтобы не отклонить существующий объект.
+            return super().to_internal_value(data)
+
+
+def parse_pk(model, value):
+    """Первичный ключ из входных данных или None, если тип неверный."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return model._meta.pk.to_python(value)
+    except DjangoValidationError:
+        return None
+
+
+class RenditionsField(serializers.Field):
+    """Ссылки на уменьшенные копии изображения по названиям размеров."""
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        urls = rendition_urls(instance, self.image_field, self.field_name)
+        request = self.context.get('request')
+        if request:
+            return {
+                name: request.build_absolute_uri(url)
+                for name, url in urls.items()
+            }
+        return urls
+
+
+class RenditionsMixin:
+    """Поля RenditionsField попадают в ответ только по запросу
+    с параметром ?renditions=true, чтобы не менять формат API."""
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        query_params = getattr(request, 'query_params', {})
+        if query_params.get('renditions') != 'true':
+            for name, field in list(fields.items()):
+                if isinstance(field, RenditionsField):
+                    del fields[name]
+        return fields
+
+
 class UserAvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для работы с фото профиля."""
     avatar = Base64ImageField()
@@ -31,6 +101,7 @@ class UserAvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ('avatar',)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.avatar = validated_data.get('avatar', instance.avatar)
         instance.save()
@@ -46,29 +117,34 @@ class UserAvatarSerializer(serializers.ModelSerializer):
         return None
 
 
-class SubscribeRecipeSerializer(serializers.ModelSerializer):
+class SubscribeRecipeSerializer(RenditionsMixin, serializers.ModelSerializer):
     """Сериализатор отображения рецептов пользователя:
     в списке рецептов автора, избранном и списке покупок."""
 
+    image_renditions = RenditionsField('image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
 
-class UserReadSerializer(serializers.ModelSerializer):
+class UserReadSerializer(RenditionsMixin, serializers.ModelSerializer):
     """Сериализатор пользователя для чтения."""
     avatar = Base64ImageField()
+    avatar_renditions = RenditionsField('avatar')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = (
             'id', 'email', 'username', 'first_name',
-            'last_name', 'is_subscribed', 'avatar',
+            'last_name', 'is_subscribed', 'avatar', 'avatar_renditions',
         )
 
     def get_is_subscribed(self, obj):
         """Подписан ли текущий пользователь на автора рецепта."""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return bool(
             request and request.user
@@ -90,22 +166,34 @@ class UserSubscriptionsListSerializer(UserReadSerializer):
             'recipes', 'recipes_count',
         )
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
+    @staticmethod
+    def get_recipes_limit(request):
+        """Значение параметра recipes_limit из запроса."""
         recipes_limit = request.GET.get('recipes_limit')
-        recipes_list = obj.recipes.all()
-        if recipes_limit is not None:
-            try:
-                recipes_limit = int(recipes_limit)
-                if recipes_limit <= 0:
-                    raise serializers.ValidationError(
-                        'recipes_limit должен быть положительным числом.'
-                    )
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            raise serializers.ValidationError(
+                'recipes_limit должен быть числом.'
+            )
+        if recipes_limit <= 0:
+            raise serializers.ValidationError(
+                'recipes_limit должен быть положительным числом.'
+            )
+        return recipes_limit
+
+    def get_recipes(self, obj):
+        if hasattr(obj, 'limited_recipes'):
+            recipes_list = obj.limited_recipes
+        else:
+            recipes_list = obj.recipes.all()
+            recipes_limit = self.get_recipes_limit(
+                self.context.get('request')
+            )
+            if recipes_limit is not None:
                 recipes_list = recipes_list[:recipes_limit]
-            except ValueError:
-                raise serializers.ValidationError(
-                    'recipes_limit должен быть числом.'
-                )
         return SubscribeRecipeSerializer(
             recipes_list,
             context=self.context,
@@ -114,7 +202,7 @@ class UserSubscriptionsListSerializer(UserReadSerializer):
 
     def get_recipes_count(self, user):
         """Количество рецептов автора."""
-        return user.recipes.count()
+        return user.recipes_count
 
 
 class UserListSerializer(serializers.ModelSerializer):
@@ -128,8 +216,25 @@ class UserListSerializer(serializers.ModelSerializer):
         )
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class UniqueCreateMixin:
+    """Создает объект одним INSERT без предварительной проверки
+    уникальности: повтор определяется по ограничению в базе данных,
+    поэтому параллельные одинаковые запросы не приводят к ошибке 500."""
+    unique_error_message = None
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.unique_error_message]
+            })
+
+
+class FollowSerializer(UniqueCreateMixin, serializers.ModelSerializer):
     """Сериализатор модели Follow."""
+    unique_error_message = 'Вы уже подписаны на этого пользователя!'
     user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
         required=False,
@@ -140,13 +245,7 @@ class FollowSerializer(serializers.ModelSerializer):
         model = Follow
         fields = ('user', 'following',)
         read_only_fields = ('user',)
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Follow.objects.all(),
-                fields=('user', 'following'),
-                message='Вы уже подписаны на этого пользователя!'
-            )
-        ]
+        validators = []
 
     def validate(self, data):
         """Проверка, что пользователь не пытается подписаться на себя."""
@@ -194,7 +293,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'slug')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(RenditionsMixin, serializers.ModelSerializer):
     """Сериализатор модели Recipe (для GET-запросов)."""
     author = UserReadSerializer(read_only=True)
     ingredients = RecipeIngredientsSerializer(
@@ -202,6 +301,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     tags = TagSerializer(many=True, read_only=True)
     image = Base64ImageField()
+    image_renditions = RenditionsField('image')
     is_favorited = serializers.SerializerMethodField('get_is_favorited',)
     is_in_shopping_cart = serializers.SerializerMethodField(
         'get_is_in_shopping_cart',
@@ -210,12 +310,20 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'id', 'author', 'name', 'image', 'text', 'ingredients', 'tags',
-            'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+            'id', 'author', 'name', 'image', 'image_renditions', 'text',
+            'ingredients', 'tags', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart',
         )
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
         """Проверяем, находится ли рецепт в избранном этого пользователя."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return bool(
             request and request.user.is_authenticated
@@ -227,6 +335,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Проверяем, есть ли рецепт в списке покупок этого пользователя."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return bool(
             request and request.user.is_authenticated
@@ -239,7 +349,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
     """Сериализатор для количества ингредиента."""
-    id = serializers.PrimaryKeyRelatedField(
+    id = ResolvedPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         source='ingredient',
         required=True
@@ -252,7 +362,7 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор создания, редактирования рецепта."""
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = ResolvedPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
     )
@@ -298,46 +408,124 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         self.create_recipe_ingredients(recipe, ingredients_data)
         return recipe
 
+    def update_recipe_ingredients(self, recipe, ingredients_data):
+        """Функция приводит ингредиенты рецепта к новому списку,
+        изменяя только отличающиеся строки."""
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.ingredient_recipe.all()
+        }
+        changed, created = [], []
+        for ingredient_data in ingredients_data:
+            ingredient = ingredient_data['ingredient']
+            amount = ingredient_data['amount']
+            recipe_ingredient = existing.pop(ingredient.pk, None)
+            if recipe_ingredient is None:
+                created.append(RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if existing:
+            RecipeIngredient.objects.filter(
+                pk__in=[obj.pk for obj in existing.values()]
+            ).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        if changed or created:
+            bump_versions(recipe_version(recipe.pk), RECIPES_VERSION)
+
     @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        instance.ingredient_recipe.all().delete()
-        self.create_recipe_ingredients(instance, ingredients_data)
-        return super().update(instance, validated_data)
+        if {tag.pk for tag in tags} != set(
+            instance.tags.values_list('pk', flat=True)
+        ):
+            instance.tags.set(tags)
+        self.update_recipe_ingredients(instance, ingredients_data)
+        update_fields = [
+            name for name, value in validated_data.items()
+            if getattr(instance, name) != value
+        ]
+        for name in update_fields:
+            setattr(instance, name, validated_data[name])
+        if update_fields:
+            instance.save(update_fields=update_fields)
+        return instance
+
+    @staticmethod
+    def collect_pks(model, values):
+        """Ключи из списка входных данных (некорректные пропускаются:
+        о них сообщит валидация поля)."""
+        if not isinstance(values, list):
+            return []
+        pks = (parse_pk(model, value) for value in values)
+        return [pk for pk in pks if pk is not None]
+
+    def to_internal_value(self, data):
+        """До валидации полей проверяем повторы и загружаем теги
+        и ингредиенты двумя запросами вида id IN (...)."""
+        if not isinstance(data, Mapping):
+            return super().to_internal_value(data)
+        # get_value() полей читает и данные форм (QueryDict): в них
+        # data.get() вернул бы только последнее значение списка.
+        tag_pks = self.collect_pks(Tag, self.fields['tags'].get_value(data))
+        if len(set(tag_pks)) != len(tag_pks):
+            raise serializers.ValidationError(
+                {'tags': ['Вы указали один и тот же тег несколько раз.']}
+            )
+        ingredient_ids = self.fields['ingredients'].get_value(data)
+        if isinstance(ingredient_ids, list):
+            ingredient_ids = [
+                item.get('id') for item in ingredient_ids
+                if isinstance(item, Mapping)
+            ]
+        ingredient_pks = self.collect_pks(Ingredient, ingredient_ids)
+        if len(set(ingredient_pks)) != len(ingredient_pks):
+            raise serializers.ValidationError({'ingredients': [
+                'Вы указали повторно один и тот же ингредиент.'
+            ]})
+        self.resolved_objects = {
+            Tag: Tag.objects.in_bulk(tag_pks) if tag_pks else {},
+            Ingredient: (
+                Ingredient.objects.in_bulk(ingredient_pks)
+                if ingredient_pks else {}
+            ),
+        }
+        return super().to_internal_value(data)
 
     def validate(self, data):
         """Валидация данных рецепта."""
-        ingredients_data = data.get('ingredients')
-        tags = data.get('tags')
-        if not tags:
+        if not data.get('tags'):
             raise serializers.ValidationError(
                 {'tags': 'Укажите тег(и).'}
             )
-        if not ingredients_data:
+        if not data.get('ingredients'):
             raise serializers.ValidationError(
                 {'ingredients': 'Укажите ингредиенты.'}
             )
-        if len(set(tags)) != len(tags):
-            raise serializers.ValidationError(
-                {'tags': 'Вы указали один и тот же тег несколько раз.'}
-            )
-        ingredient_id = [item['ingredient'].id for item in ingredients_data]
-        if len(set(ingredient_id)) != len(ingredient_id):
-            raise serializers.ValidationError({
-                'ingredients': 'Вы указали повторно один и тот же ингредиент.'
-            })
         return data
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags', Prefetch(
+                'ingredient_recipe',
+                RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
         return RecipeReadSerializer(
             instance=instance,
             context=self.context
         ).data
 
 
-class FavoriteShoppingCartAddSerializer(serializers.ModelSerializer):
+class FavoriteShoppingCartAddSerializer(
+    UniqueCreateMixin, serializers.ModelSerializer
+):
     """Базовый сериализатор избранного и списка покупок."""
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
@@ -358,31 +546,42 @@ class FavoriteShoppingCartAddSerializer(serializers.ModelSerializer):
 
 class FavoritesSerializer(FavoriteShoppingCartAddSerializer):
     """Сериализатор избранного."""
+    unique_error_message = 'Рецепт уже добавлен в избранное.'
+
     class Meta:
         model = Favorites
         fields = (
             'user', 'recipe',
         )
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorites.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в избранное.'
-            )
-        ]
+        validators = []
 
 
 class ShoppingCartSerializer(FavoriteShoppingCartAddSerializer):
     """Сериализатор списка покупок."""
+    unique_error_message = 'Рецепт уже добавлен в список покупок.'
+
     class Meta:
         model = ShoppingCart
         fields = (
             'user', 'recipe',
         )
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в список покупок.'
-            )
-        ]
+        validators = []
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для пакетных операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_RECIPES,
+    )
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Новый токен доступа (auth_token, как при входе) по неотозванному
+    токену обновления."""
+    token_class = VersionedRefreshToken
+
+    def validate(self, attrs):
+        check_version(self.token_class(attrs['refresh']))
+        return {'auth_token': super().validate(attrs)['access']}
@@ -0,0 +1,47 @@
+import csv
+import json
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+    def write(self, value):
+        return value
+
+
+def ingredient_fields(row):
+    return (
+        row['ingredient__name'],
+        row['total_amount'],
+        row['ingredient__measurement_unit'],
+    )
+
+
+def render_txt(rows):
+    for row in rows:
+        name, amount, unit = ingredient_fields(row)
+        yield f'{name}: {amount} {unit}\n'
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for row in rows:
+        yield writer.writerow(ingredient_fields(row))
+
+
+def render_json(rows):
+    yield '['
+    for number, row in enumerate(rows):
+        name, amount, unit = ingredient_fields(row)
+        yield (',' if number else '') + json.dumps(
+            {'name': name, 'amount': amount, 'measurement_unit': unit},
+            ensure_ascii=False
+        )
+    yield ']'
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json; charset=utf-8'),
+}
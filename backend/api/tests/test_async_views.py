@@ -0,0 +1,60 @@
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from api.async_views import recipes_detail_view, recipes_list_view
+from recipes.tag_map import tag_map
+from recipes.versions import TAGS_VERSION, set_versions
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+
+class AsyncRecipeViewsTest(TestCase):
+    """Асинхронные обработчики (ASYNC_READ_VIEWS) вызываются напрямую:
+    адреса строятся при импорте настроек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags(2)
+        author = create_user(0)
+        cls.recipe, = create_recipes(
+            author, 1, tags[:1], create_ingredients(2)
+        )
+        create_recipes(create_user(1), 2, tags[1:])
+
+    def setUp(self):
+        clear_caches()
+        self.factory = APIRequestFactory()
+
+    async def test_tags_filter_rebuilds_tag_map(self):
+        """Перестроение соответствия слагов после смены версии тегов
+        не выполняется синхронно в цикле событий."""
+        await tag_map.aget()
+        set_versions((TAGS_VERSION,))
+        response = await recipes_list_view(
+            self.factory.get('/api/recipes/', {'tags': 'tag0'})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        set_versions((TAGS_VERSION,))
+        response = await recipes_detail_view(
+            self.factory.get(
+                f'/api/recipes/{self.recipe.pk}/', {'tags': 'tag0'}
+            ),
+            pk=self.recipe.pk
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.recipe.pk)
+
+    async def test_validators_and_response_cache(self):
+        responses = [
+            await recipes_list_view(self.factory.get('/api/recipes/'))
+            for _ in range(2)
+        ]
+        self.assertEqual(
+            [response['X-Cache'] for response in responses], ['MISS', 'HIT']
+        )
+        response = await recipes_list_view(self.factory.get(
+            '/api/recipes/', HTTP_IF_NONE_MATCH=responses[0]['ETag']
+        ))
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,77 @@
+import threading
+from collections import Counter
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorites, Recipe, ShoppingCart
+from users.models import Follow
+
+from .utils import auth_header, clear_caches, create_recipes, create_user
+
+PARALLEL_REQUESTS = 8
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'Параллельные транзакции проверяются только в PostgreSQL'
+)
+class ConcurrentAddTest(TransactionTestCase):
+    """Одновременные одинаковые POST: один 201, остальные 400."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = create_user(0)
+        self.author = create_user(1)
+        self.recipe, = create_recipes(self.author, 1)
+        self.headers = auth_header(self.user)
+
+    def post_in_parallel(self, url):
+        barrier = threading.Barrier(PARALLEL_REQUESTS)
+        statuses = []
+
+        def post():
+            client = APIClient()
+            try:
+                barrier.wait()
+                statuses.append(client.post(url, **self.headers).status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=post) for _ in range(PARALLEL_REQUESTS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return Counter(statuses)
+
+    def test_favorite_and_shopping_cart(self):
+        for path, model, counter in (
+            ('favorite', Favorites, 'favorites_count'),
+            ('shopping_cart', ShoppingCart, 'in_carts_count'),
+        ):
+            with self.subTest(path=path):
+                statuses = self.post_in_parallel(
+                    f'/api/recipes/{self.recipe.pk}/{path}/'
+                )
+                self.assertEqual(
+                    statuses, {201: 1, 400: PARALLEL_REQUESTS - 1}
+                )
+                self.assertEqual(model.objects.count(), 1)
+                self.assertEqual(
+                    getattr(Recipe.objects.get(pk=self.recipe.pk), counter),
+                    1
+                )
+
+    def test_subscribe(self):
+        statuses = self.post_in_parallel(
+            f'/api/users/{self.author.pk}/subscribe/'
+        )
+        self.assertEqual(statuses, {201: 1, 400: PARALLEL_REQUESTS - 1})
+        self.assertEqual(Follow.objects.count(), 1)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from api.async_views import ingredients_list_view
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Recipe, Tag
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+LOCAL_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    for alias in ('default', 'state')
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProcessLocalCacheTest(TestCase):
+    """С кешем в памяти процесса версии данных не видны другим
+    процессам: ETag и кеш ответов отключаются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(
+            create_user(0), 2, create_tags(2), create_ingredients(2)
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def test_recipes_without_validators_and_response_cache(self):
+        for _ in range(2):
+            response = self.client.get('/api/recipes/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('ETag', response)
+            self.assertNotIn('X-Cache', response)
+
+    def test_tags_filter_reloads_tags(self):
+        """Соответствие слагов и id не хранится между запросами."""
+        self.client.get('/api/recipes/?tags=tag0')
+        tag = Tag.objects.create(name='Новый тег', slug='new')
+        Recipe.objects.first().tags.add(tag)
+        response = self.client.get('/api/recipes/?tags=new')
+        self.assertEqual(response.json()['count'], 1)
+
+    @mock.patch.object(ingredient_index, 'load')
+    def test_ingredient_search_does_not_build_index(self, load):
+        """Индекс не переживает запрос, поэтому ищет база."""
+        response = self.client.get('/api/ingredients/?name=Ингредиент 1')
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.json()],
+            ['Ингредиент 1']
+        )
+        load.assert_not_called()
+
+    @mock.patch.object(ingredient_index, 'load')
+    async def test_async_ingredient_search_does_not_build_index(self, load):
+        response = await ingredients_list_view(
+            APIRequestFactory().get('/api/ingredients/', {'name': 'Ингр'})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        load.assert_not_called()
@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from api.middleware import QueryBudgetExceeded
+from api.views import RecipeViewSet
+
+from .utils import (clear_caches, create_ingredients, create_recipes,
+                    create_tags, create_user)
+
+OVER_BUDGET = {'list': 1}
+
+
+@override_settings(SQL_INSTRUMENTATION=True, SQL_QUERY_BUDGET_RAISE=True)
+class QueryBudgetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_recipes(
+            create_user(0), 2, create_tags(2), create_ingredients(2)
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def test_within_budget(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries', response['Server-Timing'])
+
+    def test_over_budget_raises(self):
+        with mock.patch.object(RecipeViewSet, 'query_budgets', OVER_BUDGET):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/recipes/')
+
+    @override_settings(SQL_QUERY_BUDGET_RAISE=False)
+    def test_over_budget_logs_warning(self):
+        with mock.patch.object(RecipeViewSet, 'query_budgets', OVER_BUDGET):
+            with self.assertLogs('api.middleware', 'WARNING'):
+                response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
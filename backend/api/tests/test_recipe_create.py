@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .utils import (auth_header, clear_caches, create_ingredients, create_tags,
+                    create_user)
+
+
+def png_file():
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        'recipe.png', buffer.getvalue(), content_type='image/png'
+    )
+
+
+class RecipeCreateTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(2)
+        cls.author = create_user(0)
+
+    def setUp(self):
+        clear_caches()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def test_multipart(self):
+        """Теги и ингредиенты из данных формы (QueryDict)."""
+        data = {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': png_file(),
+            'tags': [tag.pk for tag in self.tags],
+        }
+        for index, ingredient in enumerate(self.ingredients):
+            data[f'ingredients[{index}]id'] = ingredient.pk
+            data[f'ingredients[{index}]amount'] = 10
+        response = self.client.post(
+            '/api/recipes/', data, **auth_header(self.author)
+        )
+        self.assertEqual(response.status_code, 201, response.json())
+        recipe = response.json()
+        self.assertEqual(
+            [tag['id'] for tag in recipe['tags']],
+            [tag.pk for tag in self.tags]
+        )
+        self.assertEqual(
+            {ingredient['id'] for ingredient in recipe['ingredients']},
+            {ingredient.pk for ingredient in self.ingredients}
+        )
+
+    def test_missing_tag(self):
+        response = self.client.post(
+            '/api/recipes/',
+            {
+                'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 5,
+                'image': png_file(), 'tags': [self.tags[0].pk, 0],
+                'ingredients[0]id': self.ingredients[0].pk,
+                'ingredients[0]amount': 10,
+            },
+            **auth_header(self.author)
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.json())
@@ -0,0 +1,40 @@
+from django.test import TestCase
+
+from .utils import (auth_header, clear_caches, create_ingredients,
+                    create_recipes, create_tags, create_user)
+
+
+class RecipeQueriesTest(TestCase):
+    """Число запросов к базе не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags(3)
+        ingredients = create_ingredients(5)
+        cls.user = create_user(0)
+        authors = [create_user(number) for number in range(1, 6)]
+        for author in authors:
+            create_recipes(author, 11, tags, ingredients)
+        cls.recipe = authors[0].recipes.first()
+
+    def setUp(self):
+        clear_caches()
+
+    def test_list(self):
+        for limit in (6, 50):
+            for headers, queries in (({}, 4), (auth_header(self.user), 5)):
+                with self.subTest(limit=limit, authenticated=bool(headers)):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(
+                            '/api/recipes/', {'limit': limit}, **headers
+                        )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.json()['results']), limit)
+
+    def test_detail(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        for headers, queries in (({}, 3), (auth_header(self.user), 4)):
+            with self.subTest(authenticated=bool(headers)):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url, **headers)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,69 @@
+import re
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .utils import (auth_header, clear_caches, create_ingredients,
+                    create_recipes, create_tags, create_user)
+
+# executemany() записывается в журнал запросов как "N times: <SQL>".
+WRITE_QUERY = re.compile(r'^(\d+ times: )?(INSERT|UPDATE|DELETE)\b', re.I)
+
+
+def write_queries(context):
+    return [
+        query['sql'] for query in context.captured_queries
+        if WRITE_QUERY.match(query['sql'])
+    ]
+
+
+class RecipeUpdateTest(TestCase):
+    """PATCH записывает только изменившиеся данные рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(2)
+        cls.author = create_user(0)
+        cls.recipe, = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def patch(self, **data):
+        data = {
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 10}
+                for ingredient in self.ingredients
+            ],
+            **data,
+        }
+        headers = auth_header(self.author)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                self.url, data, content_type='application/json', **headers
+            )
+        self.assertEqual(response.status_code, 200)
+        return write_queries(context)
+
+    def test_text_only_update_is_single_update(self):
+        """Поисковый индекс обновляют триггеры в том же запросе."""
+        queries = self.patch(text='Жареная картошка')
+        self.assertEqual(len(queries), 1, queries)
+        self.assertTrue(
+            queries[0].startswith('UPDATE "recipes_recipe" SET "text" ='),
+            queries
+        )
+        response = self.client.get('/api/recipes/', {'search': 'картошка'})
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [self.recipe.pk]
+        )
+
+    def test_unchanged_update_writes_nothing(self):
+        self.assertEqual(self.patch(text=self.recipe.text), [])
@@ -0,0 +1,128 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.middleware import PIN_COOKIE
+from foodgram_backend.cache import state_cache
+from foodgram_backend.db_router import (ReplicaRouter, replica_reads,
+                                        use_primary_if_recent)
+from recipes.models import Recipe
+from recipes.versions import (INGREDIENTS_VERSION, RECIPES_VERSION,
+                              TAGS_VERSION, cache_key, recipe_version,
+                              set_versions, user_state_version)
+
+from .utils import auth_header, clear_caches, create_recipes, create_user
+
+REPLICA = 'test_replica'
+PIN_SECONDS = 1
+OLD = 3600 * 10 ** 9
+
+
+@override_settings(
+    REPLICA_DATABASES=[REPLICA], REPLICA_PIN_SECONDS=PIN_SECONDS
+)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Маршрутизация чтений и ReplicaRoutingMiddleware.
+
+    Реплика — второе соединение с той же тестовой базой. Оно создается
+    после подготовки баз тестов и не входит в databases: тестовая среда
+    не создает и не очищает для него отдельную базу.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings[REPLICA] = {
+            **connections['default'].settings_dict,
+            'TEST': {'MIRROR': 'default'},
+        }
+        cls.addClassCleanup(cls.remove_replica)
+
+    @classmethod
+    def remove_replica(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        clear_caches()
+        self.user = create_user(0)
+        self.recipe, = create_recipes(create_user(1), 1)
+        # Данные изменены давно: чтения не переходят в основную базу
+        # по use_primary_if_recent.
+        old = time.time_ns() - OLD
+        state_cache.set_many({
+            cache_key(name): old for name in (
+                RECIPES_VERSION, TAGS_VERSION, INGREDIENTS_VERSION,
+                recipe_version(self.recipe.pk),
+                *map(user_state_version, get_user_model().objects.values_list(
+                    'pk', flat=True
+                )),
+            )
+        }, None)
+
+    def get(self, client, url):
+        """Ответ и число запросов к основной базе и к реплике."""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def token_client(self):
+        client = APIClient()
+        client.credentials(**auth_header(self.user))
+        return client
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        with replica_reads(REPLICA):
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+            self.assertEqual(router.db_for_read(Token), 'default')
+            self.assertEqual(router.db_for_write(Recipe), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Recipe), 'default')
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+            use_primary_if_recent([time.time_ns() - OLD])
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+            use_primary_if_recent([time.time_ns()])
+            self.assertEqual(router.db_for_read(Recipe), 'default')
+
+    def test_reads_go_to_replica(self):
+        primary, replica = self.get(APIClient(), '/api/recipes/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        # Токен читается из основной базы, остальное — с реплики.
+        primary, replica = self.get(
+            self.token_client(), f'/api/recipes/{self.recipe.pk}/'
+        )
+        self.assertEqual(primary, 1)
+        self.assertGreater(replica, 0)
+
+    def test_recent_change_reads_primary(self):
+        set_versions((RECIPES_VERSION,))
+        primary, replica = self.get(APIClient(), '/api/recipes/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_write_pins_client(self):
+        client = self.token_client()
+        response = client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], PIN_SECONDS)
+        url = f'/api/users/{self.user.pk}/'
+        for pinned_client in (client, self.token_client()):
+            with self.subTest(cookie=PIN_COOKIE in pinned_client.cookies):
+                self.assertEqual(self.get(pinned_client, url)[1], 0)
+        anonymous = APIClient()
+        anonymous.cookies[PIN_COOKIE] = '1'
+        self.assertEqual(self.get(anonymous, url)[1], 0)
+        self.assertGreater(self.get(APIClient(), url)[1], 0)
+        time.sleep(PIN_SECONDS + 0.1)
+        self.assertGreater(self.get(self.token_client(), url)[1], 0)
@@ -0,0 +1,87 @@
+from django.test import TestCase
+from prometheus_client import REGISTRY
+
+from .utils import (auth_header, clear_caches, create_ingredients,
+                    create_recipes, create_tags, create_user)
+
+
+def cache_requests(result):
+    return REGISTRY.get_sample_value(
+        'foodgram_cache_requests_total',
+        {'cache': 'response:recipes', 'result': result}
+    ) or 0
+
+
+class ResponseCacheTest(TestCase):
+    """Кеш ответов для анонимных пользователей не отдает данные,
+    измененные автором."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(2)
+        cls.author = create_user(0)
+        cls.recipe, = create_recipes(
+            cls.author, 1, cls.tags, cls.ingredients
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def get(self, url, expected_cache):
+        hits, misses = cache_requests('hit'), cache_requests('miss')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], expected_cache)
+        self.assertEqual(
+            (cache_requests('hit') - hits, cache_requests('miss') - misses),
+            (1, 0) if expected_cache == 'HIT' else (0, 1)
+        )
+        return response.json()
+
+    def update_text(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'tags': [tag.pk for tag in self.tags],
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': 10}
+                        for ingredient in self.ingredients
+                    ],
+                    'text': text,
+                },
+                content_type='application/json',
+                **auth_header(self.author)
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_author_update_is_visible(self):
+        detail_url = f'/api/recipes/{self.recipe.pk}/'
+        for url in ('/api/recipes/', detail_url):
+            self.get(url, 'MISS')
+            self.get(url, 'HIT')
+        self.update_text('Новое описание')
+        self.assertEqual(
+            self.get(detail_url, 'MISS')['text'], 'Новое описание'
+        )
+        self.assertEqual(
+            self.get('/api/recipes/', 'MISS')['results'][0]['text'],
+            'Новое описание'
+        )
+        self.get(detail_url, 'HIT')
+
+    def test_padded_pk_uses_recipe_version(self):
+        """/api/recipes/01/ зависит от той же версии, что и /1/."""
+        url = f'/api/recipes/0{self.recipe.pk}/'
+        self.get(url, 'MISS')
+        etag = self.client.get(url)['ETag']
+        self.update_text('Новое описание')
+        self.assertEqual(self.get(url, 'MISS')['text'], 'Новое описание')
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_invalid_pk_is_not_cached(self):
+        response = self.client.get('/api/recipes/abc/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('X-Cache', response)
+        self.assertNotIn('ETag', response)
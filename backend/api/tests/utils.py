@@ -0,0 +1,62 @@
+"""Общие данные для тестов API."""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+PASSWORD = 'pass12345!'
+IMAGE = 'recipes/images/recipe.png'
+
+
+def clear_caches():
+    """Очищает кеш ответов и кеш состояния (версии, метки реплик)."""
+    for cache in caches.all():
+        cache.clear()
+
+
+def create_user(number):
+    return get_user_model().objects.create_user(
+        email=f'user{number}@example.com', username=f'user{number}',
+        first_name='Имя', last_name='Фамилия', password=PASSWORD
+    )
+
+
+def auth_header(user):
+    """Заголовок Authorization с токеном, как после входа."""
+    token, _ = Token.objects.get_or_create(user=user)
+    return {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+
+
+def create_tags(count):
+    return [
+        Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+        for number in range(count)
+    ]
+
+
+def create_ingredients(count):
+    return [
+        Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(count)
+    ]
+
+
+def create_recipes(author, count, tags=(), ingredients=()):
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {author.pk}-{number}',
+            text='Описание', cooking_time=5, image=IMAGE,
+            # Копии изображения считаются созданными: файла в тестах нет.
+            image_renditions={'source': IMAGE}
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in ingredients
+        )
+        recipes.append(recipe)
+    return recipes
@@ -1,8 +1,11 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from .views import (FoodgramUserViewSet, IngredientViewSet, RecipeViewSet,
-                    TagViewSet)
+from .async_views import (ingredients_list_view, recipes_detail_view,
+                          recipes_list_view)
+from .views import (FoodgramUserViewSet, IngredientViewSet, JWTCreateView,
+                    JWTDestroyView, JWTRefreshView, RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
@@ -12,8 +15,40 @@ router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 
+# GET по этим адресам обслуживается асинхронно. Представления
+# подменяются на месте, чтобы адрес детальной страницы не перекрывал
+# действия вьюсета вроде recipes/feed/.
+async_views = {
+    'recipes-list': recipes_list_view,
+    'recipes-detail': recipes_detail_view,
+    'ingredients-list': ingredients_list_view,
+}
+
+
+def with_async_views(urls):
+    return [
+        re_path(url.pattern.regex.pattern, async_views[url.name],
+                name=url.name)
+        if url.name in async_views
+        and 'format' not in url.pattern.regex.groupindex
+        else url
+        for url in urls
+    ]
+
+
+# Вход и выход djoser с выдачей JWT вместо токена в базе.
+jwt_urlpatterns = [
+    path('auth/token/login/', JWTCreateView.as_view(), name='login'),
+    path('auth/token/refresh/', JWTRefreshView.as_view(), name='refresh'),
+    path('auth/token/logout/', JWTDestroyView.as_view(), name='logout'),
+]
+
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    *(jwt_urlpatterns if settings.JWT_AUTH else ()),
+    path('', include(
+        with_async_views(router_v1.urls) if settings.ASYNC_READ_VIEWS
+        else router_v1.urls
+    )),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
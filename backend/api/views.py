@@ -1,37 +1,78 @@
+from itertools import chain
+
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.contrib.auth import get_user_model, user_logged_in
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.serializers import UserCreateSerializer
-from djoser.views import UserViewSet
+from djoser.views import TokenCreateView, TokenDestroyView, UserViewSet
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework_simplejwt.views import TokenRefreshView
 
+from api.authentication import VersionedRefreshToken
+from api.cache import recipes_response_cache
+from api.constants import (INGREDIENTS_SEARCH_LIMIT, SHOPPING_CART_CHUNK_SIZE,
+                           SHOPPING_CART_FILENAME)
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import RecipesPagination
+from api.pagination import FeedPagination, RecipesPagination, UsersPagination
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (FavoritesSerializer, FollowSerializer,
                              IngredientSerializer, RecipeCreateSerializer,
-                             RecipeReadSerializer, ShoppingCartSerializer,
-                             TagSerializer, UserAvatarSerializer,
+                             RecipeIdsSerializer, RecipeReadSerializer,
+                             ShoppingCartSerializer, TagSerializer,
+                             TokenRefreshSerializer, UserAvatarSerializer,
                              UserListSerializer, UserReadSerializer,
-                             UserSubscriptionsListSerializer)
-from api.viewsets import TagIngredientBaseViewSet
+                             UserSubscriptionsListSerializer, parse_pk)
+from api.shopping_cart import SHOPPING_CART_FORMATS
+from api.viewsets import (AnonymousCacheMixin, ConditionalGetMixin,
+                          TagIngredientBaseViewSet)
+from foodgram_backend.cache import is_shared_cache
+from recipes.bulk import bulk_add_recipes, bulk_remove_recipes
+from recipes.feed import feed_sources
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.versions import (INGREDIENTS_VERSION, RECIPES_VERSION,
+                              TAGS_VERSION, recipe_version)
 from users.models import Follow
+from users.tokens import revoke_tokens
 
 User = get_user_model()
 
 
+def delete_locked(queryset):
+    """Удаляет строку queryset, предварительно заблокировав ее: из
+    параллельных одинаковых запросов удалит (и изменит счетчики) только
+    один, остальные получат False."""
+    with transaction.atomic():
+        obj = queryset.select_for_update().order_by().first()
+        if obj is None:
+            return False
+        obj.delete()
+    return True
+
+
 class FoodgramUserViewSet(UserViewSet):
     """Вьюсет модели пользователя и подписок."""
-    pagination_class = RecipesPagination
+    pagination_class = UsersPagination
+    query_budgets = {
+        'list': 5,
+        'retrieve': 5,
+        'create': 8,
+        'me': 4,
+        'update_avatar': 7,
+        'delete_avatar': 5,
+        'subscriptions': 6,
+        'subscribe': 14,
+        'delete_subscription': 10,
+    }
 
     def get_serializer_class(self):
         """Определяем, какой сериализатор использовать
@@ -57,6 +98,23 @@ class FoodgramUserViewSet(UserViewSet):
             context['request'] = self.request
         return context
 
+    def with_subscription_data(self, queryset):
+        """Аннотирует авторов данными для UserSubscriptionsListSerializer
+        и подгружает их последние рецепты одним запросом."""
+        recipes_limit = UserSubscriptionsListSerializer.get_recipes_limit(
+            self.request
+        )
+        recipes = Recipe.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes.limited_per_author(recipes_limit)
+        return queryset.annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user=self.request.user, following=OuterRef('pk')
+            )),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,),
@@ -93,7 +151,9 @@ class FoodgramUserViewSet(UserViewSet):
                 {'detail': 'У пользователя нет аватара.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        user.avatar.delete(save=True)
+        # Ссылки на файл и его копии освобождают сигналы recipes.signals.
+        user.avatar = None
+        user.save(update_fields=('avatar', 'avatar_renditions'))
         return Response(
             data=None, status=status.HTTP_204_NO_CONTENT
         )
@@ -105,7 +165,9 @@ class FoodgramUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """Получение списка подписок пользователя."""
         paginator = self.pagination_class()
-        queryset = User.objects.filter(followings__user=request.user)
+        queryset = self.with_subscription_data(
+            User.objects.filter(followings__user=request.user)
+        )
         result_page = paginator.paginate_queryset(queryset, request)
         serializer = UserSubscriptionsListSerializer(
             result_page, many=True, context={'request': request}
@@ -125,18 +187,22 @@ class FoodgramUserViewSet(UserViewSet):
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
+        queryset = self.with_subscription_data(
+            User.objects.filter(id=following.id)
+        )
         serializer.save()
         return Response(
-            serializer.data,
+            UserSubscriptionsListSerializer(
+                queryset.get(), context={'request': request}
+            ).data,
             status=status.HTTP_201_CREATED
         )
 
     @subscribe.mapping.delete
     def delete_subscription(self, request, id=None):
-        delete_number, _ = Follow.objects.filter(
+        if not delete_locked(Follow.objects.filter(
             user=request.user, following=get_object_or_404(User, id=id)
-        ).delete()
-        if not delete_number:
+        )):
             return Response(
                 {'detail': 'Вы не были подписаны на этого пользователя.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -150,6 +216,7 @@ class TagViewSet(TagIngredientBaseViewSet):
     """Вьюсет модели Tag."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    version_key = TAGS_VERSION
     filter_backends = (filters.SearchFilter,)
     search_fields = ('^name',)
 
@@ -158,22 +225,83 @@ class IngredientViewSet(TagIngredientBaseViewSet):
     """Вьюсет модели Ingredient."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    version_key = INGREDIENTS_VERSION
     filterset_class = IngredientFilter
     filter_backends = (DjangoFilterBackend,)
 
+    def list(self, request, *args, **kwargs):
+        # Без общего кеша индекс строился бы заново на каждый запрос:
+        # поиск тогда выполняет IngredientFilter в базе.
+        if not request.query_params.get('name') or not is_shared_cache():
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(self.search, request)
+
+    def search(self, request):
+        """Поиск по началу названия обслуживается индексом в памяти."""
+        return Response(self.get_serializer(
+            ingredient_index.search(
+                request.query_params['name'], INGREDIENTS_SEARCH_LIMIT
+            ),
+            many=True
+        ).data)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+        ConditionalGetMixin,
+        AnonymousCacheMixin,
+        viewsets.ModelViewSet
+):
     """Вьюсет модели Recipe."""
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = RecipesPagination
+    user_dependent = True
+    response_cache = recipes_response_cache
+    query_budgets = {
+        'list': 8,
+        'retrieve': 6,
+        'create': 25,
+        'update': 25,
+        'partial_update': 25,
+        'destroy': 15,
+        'feed': 8,
+        'favorite': 8,
+        'delete_favorite': 8,
+        'shopping_cart': 8,
+        'delete_shopping_cart': 8,
+        'favorite_batch': 8,
+        'shopping_cart_batch': 8,
+        'download_shopping_cart': 3,
+        'get_link': 3,
+    }
+
+    def get_version_keys(self):
+        """Версии данных, из которых строятся список и страница рецепта."""
+        if self.action == 'list':
+            return (RECIPES_VERSION, TAGS_VERSION, INGREDIENTS_VERSION)
+        if self.action == 'retrieve':
+            # Ключ версии — по числу: /api/recipes/01/ читает тот же
+            # рецепт, что и /api/recipes/1/, а сигналы обновляют recipe:1.
+            pk = parse_pk(Recipe, self.kwargs['pk'])
+            if pk is None:
+                return None
+            return (recipe_version(pk), TAGS_VERSION, INGREDIENTS_VERSION)
+        return None
+
+    def get_queryset(self):
+        """Для чтения добавляем флаги пользователя и связанные данные,
+        чтобы число запросов не зависело от размера страницы."""
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve', 'feed'):
+            return queryset.with_user_state(self.request.user)
+        return queryset
 
     def get_serializer_class(self):
         """Определяем, какой из сериализаторов будет обрабатывать данные
         в зависимости от нужного действия."""
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
@@ -207,11 +335,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
         """Функция удаления рецепта из избранного."""
-        delete_number, _ = Favorites.objects.filter(
+        if not delete_locked(Favorites.objects.filter(
             user=request.user,
             recipe=get_object_or_404(Recipe, pk=pk)
-        ).delete()
-        if not delete_number:
+        )):
             return Response(
                 {'status': 'Рецепта еще не было в избранном.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -237,17 +364,85 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk=None):
         """Функция удаления рецепта из списка покупок."""
-        delete_number, _ = ShoppingCart.objects.filter(
+        if not delete_locked(ShoppingCart.objects.filter(
             user=request.user,
             recipe=get_object_or_404(Recipe, pk=pk)
-        ).delete()
-        if not delete_number:
+        )):
             return Response(
                 {'status': 'Рецепта еще не было в списке покупок.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(
+            feed_sources(request.user), request, view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in page]
+        )
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for _, recipe_id in page
+             if recipe_id in recipes],
+            many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def change_recipes_batch(request, model):
+        """Пакетное добавление (POST) или удаление (DELETE) рецептов
+        с результатом для каждого переданного id."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        if request.method == 'POST':
+            found, changed = bulk_add_recipes(model, request.user, recipe_ids)
+            changed_status, unchanged_status = 'added', 'already_added'
+        else:
+            found, changed = bulk_remove_recipes(
+                model, request.user, recipe_ids
+            )
+            changed_status, unchanged_status = 'removed', 'not_added'
+        return Response({'results': [
+            {
+                'id': pk,
+                'status': (
+                    'not_found' if pk not in found
+                    else changed_status if pk in changed
+                    else unchanged_status
+                ),
+            }
+            for pk in recipe_ids
+        ]})
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        """Пакетное добавление и удаление рецептов в избранном."""
+        return self.change_recipes_batch(request, Favorites)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        """Пакетное добавление и удаление рецептов в списке покупок."""
+        return self.change_recipes_batch(request, ShoppingCart)
+
     @action(
         detail=True,
         url_path='get-link',
@@ -261,17 +456,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
 
+    def perform_content_negotiation(self, request, force=False):
+        """Параметр format у выгрузки списка покупок задает формат файла,
+        а не рендерер DRF."""
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
         """Получение списка ингредиентов из списка покупок пользователя."""
-        shopping_cart_items = ShoppingCart.objects.filter(user=request.user)
-        if not shopping_cart_items.exists():
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_CART_FORMATS:
             return Response(
-                {'message': 'В списке покупок нет рецептов.'},
-                status=status.HTTP_204_NO_CONTENT
+                {'format': 'Доступные форматы: '
+                 f'{", ".join(SHOPPING_CART_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         ingredients = (
             RecipeIngredient.objects
@@ -279,16 +482,48 @@ class RecipeViewSet(viewsets.ModelViewSet):
             .values('ingredient__name', 'ingredient__measurement_unit')
             .annotate(total_amount=Sum('amount'))
             .order_by('ingredient__name')
+            .iterator(chunk_size=SHOPPING_CART_CHUNK_SIZE)
+        )
+        first_ingredient = next(ingredients, None)
+        if first_ingredient is None:
+            return Response(
+                {'message': 'В списке покупок нет рецептов.'},
+                status=status.HTTP_204_NO_CONTENT
+            )
+        render, content_type = SHOPPING_CART_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            render(chain((first_ingredient,), ingredients)),
+            content_type=content_type
         )
-        filename = 'shopping_cart.txt'
-        content = ''
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            amount = ingredient['total_amount']
-            unit = ingredient['ingredient__measurement_unit']
-            content += f'{name}: {amount} {unit}\n'
-        response = HttpResponse(
-            content, content_type='text/plain; charset=utf-8'
+        response['Content-Disposition'] = (
+            'attachment; '
+            f'filename="{SHOPPING_CART_FILENAME}.{file_format}"'
         )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
+
+
+class JWTCreateView(TokenCreateView):
+    """Вход в режиме JWT: токен доступа (в поле auth_token, как
+    у токена в базе) и токен обновления."""
+
+    def _action(self, serializer):
+        user = serializer.user
+        user_logged_in.send(
+            sender=user.__class__, request=self.request, user=user
+        )
+        refresh = VersionedRefreshToken.for_user(user)
+        return Response(
+            {'auth_token': str(refresh.access_token), 'refresh': str(refresh)}
+        )
+
+
+class JWTRefreshView(TokenRefreshView):
+    serializer_class = TokenRefreshSerializer
+
+
+class JWTDestroyView(TokenDestroyView):
+    """Выход: отзывает все JWT пользователя и удаляет его токен в базе."""
+
+    def post(self, request):
+        revoke_tokens(request.user.pk)
+        return super().post(request)
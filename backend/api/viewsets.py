@@ -1,8 +1,165 @@
-from rest_framework import mixins, viewsets
+from hashlib import sha1
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+from rest_framework import mixins, status, viewsets
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from foodgram_backend.cache import is_shared_cache
+from foodgram_backend.db_router import use_primary_if_recent
+from recipes.versions import get_versions, user_state_version
+
+
+class ConditionalGetMixin:
+    """Ответ 304 на повторный GET-запрос, если данные не изменились.
+
+    ETag вычисляется по версиям из get_version_keys до обращения к базе
+    и сериализатору. Last-Modified не отправляется: с точностью до секунды
+    он не различает изменения внутри одной секунды. Без общего кеша
+    (foodgram_backend.cache) ETag не отправляется.
+    """
+    user_dependent = False
+
+    def get_version_keys(self):
+        """Версии данных, из которых строится ответ,
+        или None, если ответ не кешируется."""
+        return None
+
+    def get_etag(self, request):
+        """ETag ответа или None, если ответ не кешируется."""
+        keys = self.get_version_keys()
+        if keys is None or not is_shared_cache():
+            return None
+        user_id = None
+        if self.user_dependent and request.user.is_authenticated:
+            user_id = request.user.pk
+            keys = (*keys, user_state_version(user_id))
+        versions = get_versions(*keys)
+        use_primary_if_recent(versions)
+        return quote_etag(sha1(
+            repr((request.get_full_path(), user_id, versions)).encode()
+        ).hexdigest())
+
+    def set_etag(self, response, etag):
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        if self.user_dependent:
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        return self.set_etag(response, etag)
+
+    async def aconditional_response(self, handler, request, *args,
+                                    **kwargs):
+        """Асинхронный вариант conditional_response для api.async_views.
+        Версии читаются из кеша в отдельном потоке, как в асинхронном
+        API кеша Django."""
+        etag = await sync_to_async(self.get_etag)(request)
+        if etag is None:
+            return await handler(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        return self.set_etag(response, etag)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class AnonymousCacheMixin:
+    """Кеширует list и retrieve для анонимных пользователей.
+
+    Ключ кеша строится из параметров запроса и версий get_version_keys.
+    Без общего кеша (foodgram_backend.cache) ответы не кешируются.
+    """
+    response_cache = None
+
+    def get_version_keys(self):
+        return None
+
+    def get_cache_key(self, request):
+        """Ключ кеша ответа или None, если ответ не кешируется."""
+        keys = self.get_version_keys()
+        if (
+            keys is None or request.user.is_authenticated
+            or not is_shared_cache()
+        ):
+            return None
+        versions = get_versions(*keys)
+        use_primary_if_recent(versions)
+        return self.response_cache.make_key(request, versions)
+
+    def get_cached(self, key):
+        data = self.response_cache.get(key)
+        if data is None:
+            return None
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def set_cached(self, key, response):
+        if response.status_code == status.HTTP_200_OK:
+            self.response_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        response = self.get_cached(key)
+        if response is None:
+            response = self.set_cached(
+                key, handler(request, *args, **kwargs)
+            )
+        return response
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        """Асинхронный вариант cached_response для api.async_views.
+        Обращения к кешу выполняются в отдельном потоке."""
+        key = await sync_to_async(self.get_cache_key)(request)
+        if key is None:
+            return await handler(request, *args, **kwargs)
+        response = await sync_to_async(self.get_cached)(key)
+        if response is None:
+            response = await sync_to_async(self.set_cached)(
+                key, await handler(request, *args, **kwargs)
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
 
 
 class TagIngredientBaseViewSet(
+        ConditionalGetMixin,
         mixins.ListModelMixin,
         mixins.RetrieveModelMixin,
         viewsets.GenericViewSet
@@ -11,3 +168,11 @@ class TagIngredientBaseViewSet(
     permission_classes = (AllowAny,)
     ordering_fields = ('name',)
     pagination_class = None
+    version_key = None
+    query_budgets = {
+        'list': 3,
+        'retrieve': 3,
+    }
+
+    def get_version_keys(self):
+        return (self.version_key,)
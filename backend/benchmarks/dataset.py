@@ -0,0 +1,165 @@
+"""Набор данных для замеров API с настраиваемыми размерами."""
+from dataclasses import asdict, dataclass
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+
+from api.authentication import VersionedRefreshToken
+from recipes import feed
+from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-password'
+TAGS = ('breakfast', 'lunch', 'dinner', 'dessert', 'vegan', 'soup')
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'омлет', 'рагу', 'плов',
+    'запеканка', 'блины', 'овощи', 'курица', 'грибы', 'сыр', 'томаты',
+    'картофель', 'рис', 'говядина', 'рыба', 'ягоды',
+)
+BATCH_SIZE = 1000
+
+
+@dataclass
+class DatasetSize:
+    users: int = 50
+    recipes: int = 1000
+    ingredients_per_recipe: int = 8
+    follows: int = 10
+    favorites: int = 30
+    cart: int = 10
+
+    def as_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """Параметры команды --users, --recipes и т.д. для размеров
+        набора данных."""
+        for name, default in asdict(cls()).items():
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=int, default=default,
+                help=f'Размер набора данных: {name} (по умолчанию {default})'
+            )
+
+    @classmethod
+    def from_options(cls, options):
+        return cls(**{name: options[name] for name in asdict(cls())})
+
+
+def words(rng, count):
+    return ' '.join(rng.choices(WORDS, k=count))
+
+
+def auth_tokens(users):
+    """Токены для заголовка Authorization: JWT в режиме JWT_AUTH,
+    иначе ключи TokenAuthentication."""
+    if settings.JWT_AUTH:
+        return [
+            str(VersionedRefreshToken.for_user(user).access_token)
+            for user in users
+        ]
+    return [
+        token.key for token in Token.objects.bulk_create(
+            [Token(user=user, key=Token.generate_key()) for user in users]
+        )
+    ]
+
+
+def seed(size, rng):
+    """Заполняет базу и возвращает словарь с тем, что нужно сценариям:
+    токены и id пользователей, id и короткие ссылки рецептов, слаги
+    и id тегов, названия и id ингредиентов."""
+    call_command('load_ingredients', stdout=StringIO())
+    ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+    tags = Tag.objects.bulk_create(
+        [Tag(name=slug.capitalize(), slug=slug) for slug in TAGS]
+    )
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        [
+            User(
+                username=f'user{number}', email=f'user{number}@example.com',
+                first_name='Имя', last_name='Фамилия', password=password
+            )
+            for number in range(size.users)
+        ],
+        batch_size=BATCH_SIZE
+    )
+    tokens = auth_tokens(users)
+    recipes = Recipe.objects.bulk_create(
+        [
+            Recipe(
+                author=rng.choice(users),
+                name=f'{words(rng, 3).capitalize()} {number}',
+                text=words(rng, 40),
+                cooking_time=rng.randint(5, 180),
+                image='recipes/images/benchmark.png',
+            )
+            for number in range(size.recipes)
+        ],
+        batch_size=BATCH_SIZE
+    )
+    Recipe.tags.through.objects.bulk_create(
+        [
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(1, 3))
+        ],
+        batch_size=BATCH_SIZE
+    )
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe in recipes
+            for ingredient_id in rng.sample(
+                ingredient_ids, size.ingredients_per_recipe
+            )
+        ],
+        batch_size=BATCH_SIZE
+    )
+    Follow.objects.bulk_create(
+        [
+            Follow(user=user, following=author)
+            for user in users
+            for author in rng.sample(
+                [other for other in users if other != user],
+                min(size.follows, len(users) - 1)
+            )
+        ],
+        batch_size=BATCH_SIZE
+    )
+    for model, per_user in ((Favorites, size.favorites),
+                            (ShoppingCart, size.cart)):
+        model.objects.bulk_create(
+            [
+                model(user=user, recipe=recipe)
+                for user in users
+                for recipe in rng.sample(recipes, min(per_user, len(recipes)))
+            ],
+            batch_size=BATCH_SIZE
+        )
+    call_command('reconcile_counters', stdout=StringIO())
+    for follow in Follow.objects.select_related('following'):
+        feed.backfill(follow)
+    return {
+        'tokens': tokens,
+        'users': [user.pk for user in users],
+        'recipes': [recipe.pk for recipe in recipes],
+        'short_urls': [recipe.short_url for recipe in recipes],
+        'tags': list(TAGS),
+        'tag_ids': [tag.pk for tag in tags],
+        'ingredient_ids': ingredient_ids,
+        'ingredients': list(
+            Ingredient.objects.values_list('name', flat=True)
+        ),
+    }
@@ -0,0 +1,373 @@
+import base64
+import json
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from itertools import count
+from pathlib import Path
+
+import django
+from django.core.cache import caches
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+
+from api.middleware import QueryStats
+from benchmarks.dataset import DatasetSize, seed
+from benchmarks.utils import latency_summary, test_database
+from recipes.renditions import executor
+
+BENCHMARKS_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_OUTPUT = BENCHMARKS_DIR / 'results' / 'latest.json'
+DEFAULT_BASELINE = BENCHMARKS_DIR / 'baseline.json'
+DEFAULT_ITERATIONS = 30
+DEFAULT_MEMORY_ITERATIONS = 3
+DEFAULT_TOLERANCE = 0.25
+WARMUP = 2
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+class Scenarios:
+    """Запросы к API, по одному методу на замеряемый сценарий.
+
+    Каждый метод выполняет один запрос и возвращает ответ; данные
+    выбираются генератором rng, чтобы запуски были воспроизводимы.
+    """
+
+    def __init__(self, data, rng):
+        self.data = data
+        self.rng = rng
+        self.client = Client()
+        self.numbers = count()
+        self.image = image_data()
+        self.toggled = {}
+
+    def auth(self, index=None):
+        tokens = self.data['tokens']
+        key = tokens[self.rng.randrange(len(tokens))
+                     if index is None else index]
+        return {'HTTP_AUTHORIZATION': f'Token {key}'}
+
+    def get(self, path, params=None, **headers):
+        return self.client.get(path, params or {}, **headers)
+
+    def send(self, method, path, payload, **headers):
+        return getattr(self.client, method)(
+            path, json.dumps(payload), content_type='application/json',
+            **headers
+        )
+
+    def recipe_id(self):
+        return self.rng.choice(self.data['recipes'])
+
+    def tags(self):
+        return self.rng.sample(self.data['tags'], 2)
+
+    def recipes_list(self):
+        return self.get('/api/recipes/', **self.auth())
+
+    def recipes_list_anonymous(self):
+        return self.get('/api/recipes/', {'page': self.rng.randint(1, 5)})
+
+    def recipes_list_tags(self):
+        return self.get('/api/recipes/', {'tags': self.tags()}, **self.auth())
+
+    def recipes_list_favorited_in_cart(self):
+        return self.get(
+            '/api/recipes/',
+            {'is_favorited': 1, 'is_in_shopping_cart': 1},
+            **self.auth()
+        )
+
+    def recipes_list_author_tags(self):
+        return self.get(
+            '/api/recipes/',
+            {'author': self.rng.choice(self.data['users']),
+             'tags': self.tags()},
+            **self.auth()
+        )
+
+    def recipes_list_search(self):
+        return self.get(
+            '/api/recipes/', {'search': 'суп картофель'}, **self.auth()
+        )
+
+    def recipes_list_cursor(self):
+        return self.get('/api/recipes/', {'cursor': ''}, **self.auth())
+
+    def recipe_detail(self):
+        return self.get(f'/api/recipes/{self.recipe_id()}/', **self.auth())
+
+    def feed(self):
+        return self.get('/api/recipes/feed/', **self.auth())
+
+    def subscriptions(self):
+        return self.get(
+            '/api/users/subscriptions/', {'recipes_limit': 3}, **self.auth()
+        )
+
+    def ingredients_autocomplete(self):
+        name = self.rng.choice(self.data['ingredients'])
+        return self.get(
+            '/api/ingredients/',
+            {'name': name[:self.rng.randint(1, min(4, len(name)))]}
+        )
+
+    def download_shopping_cart(self):
+        response = self.get(
+            '/api/recipes/download_shopping_cart/', **self.auth()
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def recipe_payload(self, index):
+        number = next(self.numbers)
+        ingredients = self.rng.sample(self.data['ingredient_ids'], 8)
+        return {
+            'name': f'Замер {index} {number}',
+            'text': f'Описание рецепта {number}',
+            'cooking_time': self.rng.randint(5, 120),
+            'image': self.image,
+            'tags': self.rng.sample(self.data['tag_ids'], 2),
+            'ingredients': [
+                {'id': pk, 'amount': self.rng.randint(1, 300)}
+                for pk in ingredients
+            ],
+        }
+
+    def recipe_create(self):
+        index = self.rng.randrange(len(self.data['tokens']))
+        response = self.send(
+            'post', '/api/recipes/', self.recipe_payload(index),
+            **self.auth(index)
+        )
+        self.data.setdefault('created', []).append(
+            (index, response.json()['id'])
+        )
+        return response
+
+    def created_recipe(self):
+        """Рецепт, созданный замером, вместе с индексом автора."""
+        if not self.data.get('created'):
+            self.recipe_create()
+        return self.rng.choice(self.data['created'])
+
+    def recipe_update(self):
+        index, pk = self.created_recipe()
+        payload = self.recipe_payload(index)
+        del payload['image']
+        return self.send(
+            'patch', f'/api/recipes/{pk}/', payload, **self.auth(index)
+        )
+
+    def favorite_toggle(self):
+        """Добавление в избранное и удаление чередуются для пары
+        (пользователь, рецепт); рецепты берутся из созданных замером,
+        чтобы не пересекаться с избранным из набора данных."""
+        index = self.rng.randrange(len(self.data['tokens']))
+        _, pk = self.created_recipe()
+        method = 'delete' if self.toggled.pop((index, pk), False) else 'post'
+        if method == 'post':
+            self.toggled[(index, pk)] = True
+        return getattr(self.client, method)(
+            f'/api/recipes/{pk}/favorite/', **self.auth(index)
+        )
+
+
+SCENARIOS = (
+    'recipes_list',
+    'recipes_list_anonymous',
+    'recipes_list_tags',
+    'recipes_list_favorited_in_cart',
+    'recipes_list_author_tags',
+    'recipes_list_search',
+    'recipes_list_cursor',
+    'recipe_detail',
+    'feed',
+    'subscriptions',
+    'ingredients_autocomplete',
+    'download_shopping_cart',
+    'recipe_create',
+    'recipe_update',
+    'favorite_toggle',
+)
+
+
+def measure(scenario, iterations, memory_iterations):
+    """Задержка, число SQL-запросов и пиковая память сценария."""
+    for _ in range(WARMUP):
+        scenario()
+    samples = []
+    queries = 0
+    for _ in range(iterations):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            started = time.perf_counter()
+            response = scenario()
+            samples.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{scenario.__name__}: ответ {response.status_code}'
+            )
+        queries = max(queries, stats.count)
+    tracemalloc.start()
+    try:
+        for _ in range(memory_iterations):
+            scenario()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        **latency_summary(samples),
+        'queries': queries,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Строки сравнения с базовыми результатами и список регрессий."""
+    lines, regressions = [], []
+    for name, current in results['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None:
+            lines.append(f'{name}: нет в базовых результатах')
+            continue
+        change = (current['p95'] - base['p95']) / base['p95'] * 100
+        lines.append(
+            f'{name}: p95 {base["p95"]} -> {current["p95"]} мс '
+            f'({change:+.0f}%), запросов {base["queries"]} -> '
+            f'{current["queries"]}, память {base["peak_memory_kb"]} -> '
+            f'{current["peak_memory_kb"]} КБ'
+        )
+        if current['queries'] > base['queries']:
+            regressions.append(f'{name}: больше SQL-запросов')
+        if current['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 вырос на {change:.0f}%')
+    return lines, regressions
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Замер задержки, числа SQL-запросов и памяти основных '
+        'эндпоинтов API на сгенерированных данных'
+    )
+
+    def add_arguments(self, parser):
+        DatasetSize.add_arguments(parser)
+        parser.add_argument(
+            '--iterations', type=int, default=DEFAULT_ITERATIONS,
+            help='Количество замеров каждого сценария'
+        )
+        parser.add_argument(
+            '--memory-iterations', type=int,
+            default=DEFAULT_MEMORY_ITERATIONS,
+            help='Количество запросов при замере памяти'
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Замерить только указанные сценарии'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', type=Path, default=DEFAULT_OUTPUT,
+            help='Куда сохранить результаты в JSON'
+        )
+        parser.add_argument(
+            '--baseline', type=Path, default=DEFAULT_BASELINE,
+            help='Базовые результаты для сравнения'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Сохранить результаты как новые базовые'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Завершиться с ошибкой при регрессии относительно базовых'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help='Допустимый рост p95 (доля, по умолчанию 0.25)'
+        )
+
+    def handle(self, *args, **options):
+        size = DatasetSize.from_options(options)
+        rng = random.Random(options['seed'])
+        results = {
+            'meta': {
+                'dataset': size.as_dict(),
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'endpoints': {},
+        }
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root), \
+                    test_database():
+                for cache in caches.all():
+                    cache.clear()
+                self.stdout.write(f'Заполнение базы: {size.as_dict()}')
+                data = seed(size, rng)
+                scenarios = Scenarios(data, rng)
+                for name in options['scenario'] or SCENARIOS:
+                    result = measure(
+                        getattr(scenarios, name), options['iterations'],
+                        options['memory_iterations']
+                    )
+                    results['endpoints'][name] = result
+                    self.stdout.write(
+                        f'{name}: p50={result["p50"]} p95={result["p95"]} '
+                        f'p99={result["p99"]} мс, '
+                        f'запросов {result["queries"]}, '
+                        f'память {result["peak_memory_kb"]} КБ'
+                    )
+                executor.shutdown(wait=True)
+                connections.close_all()
+        finally:
+            teardown_test_environment()
+        self.save(results, options['output'])
+        if options['save_baseline']:
+            self.save(results, options['baseline'])
+            return
+        if not options['baseline'].exists():
+            self.stdout.write('Базовых результатов нет, сравнение пропущено.')
+            return
+        baseline = json.loads(options['baseline'].read_text())
+        lines, regressions = compare(
+            results, baseline, options['tolerance']
+        )
+        self.stdout.write('Сравнение с базовыми результатами:')
+        for line in lines:
+            self.stdout.write(f'  {line}')
+        if regressions:
+            message = 'Регрессии: ' + '; '.join(regressions)
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+    def save(self, results, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(results, ensure_ascii=False, indent=2) + '\n'
+        )
+        self.stdout.write(f'Результаты сохранены в {path}')
@@ -0,0 +1,65 @@
+import random
+import time
+from io import StringIO
+
+from django.core.management import BaseCommand, call_command
+
+from api.constants import INGREDIENTS_SEARCH_LIMIT
+from api.serializers import IngredientSerializer
+from benchmarks.utils import latency_summary, test_database
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+DEFAULT_QUERIES = 300
+
+
+def search_orm(prefix):
+    return IngredientSerializer(
+        Ingredient.objects.filter(name__istartswith=prefix), many=True
+    ).data
+
+
+def search_index(prefix):
+    return IngredientSerializer(
+        ingredient_index.search(prefix, INGREDIENTS_SEARCH_LIMIT), many=True
+    ).data
+
+
+class Command(BaseCommand):
+
+    help = 'Замер задержки автодополнения ингредиентов на каждое нажатие'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=DEFAULT_QUERIES,
+            help='Количество набираемых названий'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with test_database():
+            call_command('load_ingredients', stdout=StringIO())
+            names = list(Ingredient.objects.values_list('name', flat=True))
+            random.seed(options['seed'])
+            keystrokes = [
+                name[:length]
+                for name in random.choices(names, k=options['queries'])
+                for length in range(1, len(name) + 1)
+            ]
+            search_index('')
+            for title, search in (
+                ('ORM (istartswith)', search_orm),
+                ('индекс в памяти', search_index),
+            ):
+                samples = []
+                for prefix in keystrokes:
+                    started = time.perf_counter()
+                    search(prefix)
+                    samples.append(time.perf_counter() - started)
+                summary = ', '.join(
+                    f'{name}={value} мс'
+                    for name, value in latency_summary(samples).items()
+                )
+                self.stdout.write(
+                    f'{title}: {len(keystrokes)} нажатий, {summary}'
+                )
@@ -0,0 +1,61 @@
+import csv
+import tempfile
+from io import StringIO
+
+from django.core.management import BaseCommand, call_command
+
+from benchmarks.utils import test_database, timer
+from recipes.models import Ingredient
+
+BUNDLED_PATH = 'data/ingredients.csv'
+DEFAULT_SYNTHETIC_ROWS = 1_000_000
+MEASUREMENT_UNITS = ('г', 'мл', 'шт.', 'по вкусу', 'ст. л.', 'ч. л.')
+
+
+def write_synthetic_catalog(file, rows):
+    writer = csv.writer(file)
+    writer.writerow(('name', 'measurement_unit'))
+    for number in range(rows):
+        writer.writerow((
+            f'ингредиент {number}',
+            MEASUREMENT_UNITS[number % len(MEASUREMENT_UNITS)],
+        ))
+    file.flush()
+
+
+class Command(BaseCommand):
+
+    help = 'Замер времени загрузки каталога ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=DEFAULT_SYNTHETIC_ROWS,
+            help='Количество строк синтетического каталога'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def load(self, path, batch_size):
+        call_command(
+            'load_ingredients', path, batch_size=batch_size, stdout=StringIO()
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        batch_size = options['batch_size']
+        with test_database():
+            with timer(results, f'{BUNDLED_PATH}: первая загрузка'):
+                self.load(BUNDLED_PATH, batch_size)
+            with timer(results, f'{BUNDLED_PATH}: повторная загрузка'):
+                self.load(BUNDLED_PATH, batch_size)
+            Ingredient.objects.all().delete()
+            with tempfile.NamedTemporaryFile(
+                'w', suffix='.csv', encoding='utf-8'
+            ) as file:
+                write_synthetic_catalog(file, options['rows'])
+                name = f'синтетический каталог ({options["rows"]} строк)'
+                with timer(results, f'{name}: первая загрузка'):
+                    self.load(file.name, batch_size)
+                with timer(results, f'{name}: повторная загрузка'):
+                    self.load(file.name, batch_size)
+        for name, seconds in results.items():
+            self.stdout.write(f'{name}: {seconds:.2f} с')
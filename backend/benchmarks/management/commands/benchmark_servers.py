@@ -0,0 +1,217 @@
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.dataset import DatasetSize, seed
+from benchmarks.utils import latency_summary, test_database
+
+BENCHMARKS_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_OUTPUT = BENCHMARKS_DIR / 'results' / 'servers.json'
+DEFAULT_CONCURRENCY = '1,8,32'
+DEFAULT_REQUESTS = 400
+DEFAULT_WORKERS = 1
+HOST = '127.0.0.1'
+PORT = 8765
+STARTUP_TIMEOUT = 30
+WARMUP = 20
+
+SERVERS = {
+    'wsgi': (
+        ['gunicorn', 'foodgram_backend.wsgi', '--bind', f'{HOST}:{PORT}',
+         '--log-level', 'warning', '--workers'],
+        {'ASYNC_READ_VIEWS': 'False'},
+    ),
+    'asgi': (
+        ['uvicorn', 'foodgram_backend.asgi:application', '--host', HOST,
+         '--port', str(PORT), '--log-level', 'warning', '--no-access-log',
+         '--workers'],
+        {'ASYNC_READ_VIEWS': 'True'},
+    ),
+}
+
+
+def request_paths(data, rng):
+    """Бесконечная последовательность (путь, заголовки) в пропорциях
+    обычной нагрузки на чтение."""
+    while True:
+        headers = {
+            'Authorization': f'Token {rng.choice(data["tokens"])}'
+        }
+        yield rng.choice((
+            ('/api/recipes/?' + urlencode({'page': rng.randint(1, 5)}),
+             headers),
+            ('/api/recipes/?' + urlencode(
+                {'tags': rng.choice(data['tags'])}
+            ), headers),
+            (f'/api/recipes/{rng.choice(data["recipes"])}/', headers),
+            ('/api/ingredients/?' + urlencode(
+                {'name': rng.choice(data['ingredients'])[:2]}
+            ), {}),
+            (f'/r/{rng.choice(data["short_urls"])}/', {}),
+        ))
+
+
+def client(data, seed_value, count):
+    """Выполняет count запросов на одном соединении и возвращает
+    длительности и число ошибок."""
+    paths = request_paths(data, random.Random(seed_value))
+    server = http.client.HTTPConnection(HOST, PORT)
+    samples, errors = [], 0
+    try:
+        for _ in range(count):
+            path, headers = next(paths)
+            started = time.perf_counter()
+            try:
+                server.request('GET', path, headers=headers)
+                response = server.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                server.close()
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - started)
+            if response.status >= 400:
+                errors += 1
+    finally:
+        server.close()
+    return samples, errors
+
+
+def run_load(data, concurrency, total, seed_value):
+    per_client = max(1, total // concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(
+            lambda number: client(data, seed_value + number, per_client),
+            range(concurrency)
+        ))
+    elapsed = time.perf_counter() - started
+    samples = [sample for result, _ in results for sample in result]
+    errors = sum(errors for _, errors in results)
+    return {
+        'requests': len(samples) + errors,
+        'errors': errors,
+        'rps': round(len(samples) / elapsed, 1),
+        **latency_summary(samples or [0]),
+    }
+
+
+def wait_ready(process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске.')
+        server = http.client.HTTPConnection(HOST, PORT, timeout=1)
+        try:
+            server.request('GET', '/api/tags/')
+            if server.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+        finally:
+            server.close()
+    raise CommandError('Сервер не запустился.')
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Пропускная способность чтения API под WSGI (gunicorn) и ASGI '
+        '(uvicorn, асинхронные обработчики) при разном числе '
+        'одновременных клиентов'
+    )
+
+    def add_arguments(self, parser):
+        DatasetSize.add_arguments(parser)
+        parser.add_argument(
+            '--server', action='append', choices=tuple(SERVERS),
+            help='Замерить только указанные серверы'
+        )
+        parser.add_argument(
+            '--concurrency', default=DEFAULT_CONCURRENCY,
+            help='Числа одновременных клиентов через запятую'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=DEFAULT_REQUESTS,
+            help='Количество запросов на каждое число клиентов'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=DEFAULT_WORKERS,
+            help='Количество процессов сервера'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', type=Path, default=DEFAULT_OUTPUT,
+            help='Куда сохранить результаты в JSON'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'Нужен PostgreSQL: серверы работают в отдельных процессах '
+                'и должны видеть одну тестовую базу.'
+            )
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        size = DatasetSize.from_options(options)
+        results = {
+            'meta': {
+                'dataset': size.as_dict(),
+                'requests': options['requests'],
+                'workers': options['workers'],
+            },
+            'servers': {},
+        }
+        with test_database():
+            self.stdout.write(f'Заполнение базы: {size.as_dict()}')
+            data = seed(size, random.Random(options['seed']))
+            env = {
+                **os.environ,
+                'POSTGRES_DB': connection.settings_dict['NAME'],
+                'SQL_INSTRUMENTATION': 'False',
+            }
+            for name in options['server'] or SERVERS:
+                command, server_env = SERVERS[name]
+                results['servers'][name] = self.measure(
+                    [sys.executable, '-m', *command,
+                     str(options['workers'])],
+                    {**env, **server_env}, data, levels, options
+                )
+            connection.close()
+        options['output'].parent.mkdir(parents=True, exist_ok=True)
+        options['output'].write_text(
+            json.dumps(results, ensure_ascii=False, indent=2) + '\n'
+        )
+        self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+    def measure(self, command, env, data, levels, options):
+        process = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR)
+        try:
+            wait_ready(process)
+            run_load(data, 1, WARMUP, options['seed'])
+            server_results = {}
+            for level in levels:
+                result = run_load(
+                    data, level, options['requests'], options['seed']
+                )
+                server_results[level] = result
+                self.stdout.write(
+                    f'{command[2]}, клиентов {level}: '
+                    f'{result["rps"]} запросов/с, p50={result["p50"]} '
+                    f'p95={result["p95"]} p99={result["p99"]} мс, '
+                    f'ошибок {result["errors"]}'
+                )
+            return server_results
+        finally:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,39 @@
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def test_database():
+    """Создает отдельную тестовую базу на время замера."""
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def timer(results, name):
+    """Записывает в results время выполнения блока в секундах."""
+    started = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - started
+
+
+def percentile(samples, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, -(-len(ordered) * percent // 100) - 1))
+    return ordered[int(rank)]
+
+
+def latency_summary(samples):
+    """p50/p95/p99 в миллисекундах."""
+    return {
+        f'p{percent}': round(percentile(samples, percent) * 1000, 3)
+        for percent in (50, 95, 99)
+    }
@@ -0,0 +1,23 @@
+"""Кеш состояния и проверка, что он общий для процессов сервера.
+
+В кеше состояния (алиас state) хранятся версии данных
+(recipes.versions), версии токенов (users.tokens) и метки чтения из
+основной базы (api.middleware): записи без таймаута, которые нельзя
+вытеснять. Изменение, записанное в кеш одного процесса, другие процессы
+не увидят, поэтому с кешем в памяти процесса (LocMemCache) и без кеша
+(DummyCache) основанные на версиях валидаторы ответов, кеш ответов
+и данные в памяти отключаются.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.connection import ConnectionProxy
+
+STATE_CACHE_ALIAS = 'state'
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+state_cache = ConnectionProxy(caches, STATE_CACHE_ALIAS)
+
+
+def is_shared_cache():
+    return not isinstance(caches[STATE_CACHE_ALIAS], PROCESS_LOCAL_CACHES)
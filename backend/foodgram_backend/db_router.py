@@ -0,0 +1,75 @@
+"""Чтение с реплик базы данных.
+
+ReplicaRoutingMiddleware (api.middleware) на время безопасного запроса
+к API выбирает реплику, и ReplicaRouter направляет на нее чтения
+этого запроса. Запись, чтения вне таких запросов, внутри транзакции
+и чтения моделей аутентификации идут в основную базу.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Токены и сессии читаются из основной базы: только что выданный
+# токен мог еще не дойти до реплики, а удаленный — остаться на ней.
+PRIMARY_MODELS = {'authtoken.token', 'sessions.session'}
+
+
+class ReadState:
+    """Реплика для чтений текущего запроса (None — основная база)."""
+
+    def __init__(self, replica):
+        self.replica = replica
+
+
+read_state = ContextVar('read_state', default=None)
+
+
+@contextmanager
+def replica_reads(replica):
+    """Чтения внутри блока идут на replica (None — в основную базу)."""
+    token = read_state.set(ReadState(replica))
+    try:
+        yield
+    finally:
+        read_state.reset(token)
+
+
+def use_primary():
+    """Остальные чтения текущего запроса идут в основную базу."""
+    state = read_state.get()
+    if state is not None:
+        state.replica = None
+
+
+def use_primary_if_recent(versions):
+    """Данные, измененные меньше REPLICA_PIN_SECONDS назад, могли еще
+    не дойти до реплики: без этого устаревший ответ попал бы в кеш
+    или получил ETag новой версии. versions — время изменений
+    в наносекундах (recipes.versions)."""
+    age = time.time_ns() - max(versions)
+    if age < settings.REPLICA_PIN_SECONDS * 10 ** 9:
+        use_primary()
+
+
+class ReplicaRouter:
+    """Маршрутизация чтений на реплику, выбранную для запроса."""
+
+    def db_for_read(self, model, **hints):
+        state = read_state.get()
+        if (
+            state is None
+            or state.replica is None
+            or model._meta.label_lower in PRIMARY_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
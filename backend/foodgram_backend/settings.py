@@ -1,4 +1,6 @@
 import os
+import sys
+from datetime import timedelta
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
@@ -28,9 +30,13 @@ INSTALLED_APPS = [
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
+    'benchmarks.apps.BenchmarksConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.SQLInstrumentationMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +88,69 @@ POSTGRESQL_DB = {
 
 DATABASES = SQLITE_DB if DATABASE_ENGINE else POSTGRESQL_DB
 
+# Реплики только для чтения: хосты PostgreSQL или файлы SQLite через
+# запятую. Безопасные запросы к API читают с реплик, после записи клиент
+# REPLICA_PIN_SECONDS секунд читает из основной базы (см.
+# foodgram_backend.db_router). Схему реплики SQLite для локальной
+# проверки создает migrate --database replica1.
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        **(
+            {'NAME': BASE_DIR / replica} if DATABASE_ENGINE
+            else {'HOST': replica}
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+DATABASE_ROUTERS = ['foodgram_backend.db_router.ReplicaRouter']
+
+# Кеши должны быть общими для процессов gunicorn (FileBasedCache на одном
+# сервере, Redis или Memcached на нескольких). С LocMemCache и DummyCache
+# ETag, кеш ответов и данные в памяти отключаются (foodgram_backend.cache).
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+)
+# FileBasedCache и LocMemCache при переполнении удаляют случайную треть
+# записей; другие бэкенды не принимают MAX_ENTRIES.
+CULLED_CACHE_BACKENDS = (
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def cache_options(max_entries):
+    if CACHE_BACKEND in CULLED_CACHE_BACKENDS:
+        return {'MAX_ENTRIES': max_entries}
+    return {}
+
+
+CACHES = {
+    # Кеш ответов: записи с таймаутом, их вытеснение безопасно.
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache'),
+        'OPTIONS': cache_options(
+            int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+        ),
+    },
+    # Версии данных (по ключу на рецепт и пользователя), версии токенов
+    # JWT и метки чтения из основной базы: без вытеснения. Для Redis
+    # нужна политика maxmemory-policy noeviction или volatile-*.
+    'state': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'STATE_CACHE_LOCATION', '/tmp/foodgram_state'
+        ),
+        'OPTIONS': cache_options(sys.maxsize),
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -115,16 +184,38 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = 'https://myfoodgram.sytes.net/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Имена загруженных файлов — хеш содержимого (recipes.storage).
+STORAGES = {
+    'default': {
+        'BACKEND': 'recipes.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Уменьшенные копии изображений создаются в фоновом потоке после
+# фиксации транзакции; False — синхронно (удобно в тестах и командах).
+IMAGE_RENDITIONS_ASYNC = os.getenv(
+    'IMAGE_RENDITIONS_ASYNC', default='True'
+) == 'True'
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Вход выдает JWT (api.authentication): пользователь запроса определяется
+# по подписи токена без запроса к базе. Выданные раньше токены в базе
+# продолжают приниматься.
+JWT_AUTH = os.getenv('JWT_AUTH', 'False') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        *(['api.authentication.JWTAuthentication'] if JWT_AUTH else []),
         'rest_framework.authentication.TokenAuthentication',
     ],
 
@@ -136,6 +227,17 @@ REST_FRAMEWORK = {
     ],
 }
 
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_MINUTES', 15))
+    ),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_DAYS', 7))
+    ),
+    # Фронтенд передает auth_token в заголовке Authorization: Token ...
+    'AUTH_HEADER_TYPES': ('Token', 'Bearer'),
+}
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -154,4 +256,39 @@ CSRF_TRUSTED_ORIGINS = os.getenv('CSRF_TRUSTED_ORIGINS', default='https://*.syte
 
 API_URL_PREFIX = '/api/'
 SITE_URL_PREFIX = '/'
+# Ключ перестановки коротких ссылок: при смене ключа новые ссылки
+# могут совпасть с уже выданными.
+SHORT_URL_KEY = os.getenv('SHORT_URL_KEY', 'foodgram-short-url')
+
+# Асинхронные обработчики GET-запросов списка и страницы рецепта
+# и автодополнения ингредиентов (api.async_views) для запуска под
+# ASGI-сервером: uvicorn foodgram_backend.asgi:application.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
+# Учет SQL-запросов: заголовок Server-Timing, строка лога на каждый
+# запрос и бюджеты запросов вьюсетов (атрибут query_budgets).
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'False') == 'True'
+# Превышение бюджета: исключение (для тестов) вместо предупреждения в логе.
+SQL_QUERY_BUDGET_RAISE = os.getenv(
+    'SQL_QUERY_BUDGET_RAISE', 'False'
+) == 'True'
+# manage.py test включает обе настройки (foodgram_backend.test_runner).
+TEST_RUNNER = 'foodgram_backend.test_runner.BudgetTestRunner'
+
+# Метрики Prometheus на /metrics: доступны персоналу или по токену
+# (Authorization: Bearer <METRICS_TOKEN>). При нескольких процессах
+# gunicorn задайте PROMETHEUS_MULTIPROC_DIR (см. gunicorn.conf.py).
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.middleware': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
 RECIPE_URL = '/recipes/{id}/'
@@ -0,0 +1,18 @@
+"""Запуск тестов (настройка TEST_RUNNER)."""
+import logging
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class BudgetTestRunner(DiscoverRunner):
+    """DiscoverRunner с проверкой бюджетов SQL-запросов: любой
+    запрос к API, превысивший бюджет вьюсета (query_budgets), завершается
+    исключением QueryBudgetExceeded и роняет тест."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.SQL_INSTRUMENTATION = True
+        settings.SQL_QUERY_BUDGET_RAISE = True
+        # Строка лога на каждый запрос в выводе тестов не нужна.
+        logging.getLogger('api.middleware').setLevel(logging.WARNING)
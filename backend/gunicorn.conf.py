@@ -0,0 +1,19 @@
+"""Настройки gunicorn: общий каталог метрик Prometheus для всех
+рабочих процессов (PROMETHEUS_MULTIPROC_DIR)."""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """Очищает метрики предыдущего запуска."""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
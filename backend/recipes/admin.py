@@ -43,10 +43,12 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('tags',)
     list_display_links = ('name',)
 
-    @admin.display(description='Добавления в избранное')
+    @admin.display(
+        description='Добавления в избранное', ordering='favorites_count'
+    )
     def favorite_amount(self, obj):
         """Количество добавлений в избранное."""
-        return Favorites.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
 class FavoritesAdmin(admin.ModelAdmin):
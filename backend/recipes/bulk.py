@@ -0,0 +1,79 @@
+from django.db import connections, router, transaction
+
+from .counters import change_counters
+from .models import Recipe
+from .versions import bump_versions, user_state_version
+
+
+def existing_recipes(recipe_ids):
+    return set(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list('pk', flat=True)
+    )
+
+
+def execute_returning_recipes(model, sql, params):
+    """Выполняет INSERT или DELETE с RETURNING recipe_id и возвращает
+    множество id рецептов в действительно измененных строках."""
+    using = router.db_for_write(model)
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return {recipe_id for recipe_id, in cursor.fetchall()}
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+@transaction.atomic
+def bulk_add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты в избранное или список покупок одним INSERT.
+
+    Возвращает множества найденных и добавленных рецептов. Добавленными
+    считаются строки из RETURNING: строки, которые параллельный запрос
+    успел вставить раньше, ON CONFLICT DO NOTHING пропускает. Пакетные
+    операции не отправляют сигналы, поэтому счетчики и версию данных
+    пользователя обновляем здесь.
+    """
+    found = existing_recipes(recipe_ids)
+    if not found:
+        return found, set()
+    table = model._meta.db_table
+    added = execute_returning_recipes(
+        model,
+        f'INSERT INTO {table} (user_id, recipe_id) '
+        f'SELECT %s, id FROM {Recipe._meta.db_table} '
+        f'WHERE id IN ({placeholders(found)}) '
+        'ON CONFLICT (user_id, recipe_id) DO NOTHING RETURNING recipe_id',
+        (user.pk, *found)
+    )
+    if added:
+        change_counters(
+            model, [model(user=user, recipe_id=pk) for pk in added], 1
+        )
+        bump_versions(user_state_version(user.pk))
+    return found, added
+
+
+@transaction.atomic
+def bulk_remove_recipes(model, user, recipe_ids):
+    """Удаляет рецепты из избранного или списка покупок одним DELETE.
+
+    Возвращает множества найденных и удаленных рецептов. Обычный delete()
+    отправил бы сигналы и обновил счетчики отдельным запросом на каждую
+    строку, поэтому удаленные строки берутся из RETURNING.
+    """
+    found = existing_recipes(recipe_ids)
+    if not found:
+        return found, set()
+    removed = execute_returning_recipes(
+        model,
+        f'DELETE FROM {model._meta.db_table} WHERE user_id = %s '
+        f'AND recipe_id IN ({placeholders(found)}) RETURNING recipe_id',
+        (user.pk, *found)
+    )
+    if removed:
+        change_counters(
+            model, [model(user=user, recipe_id=pk) for pk in removed], -1
+        )
+        bump_versions(user_state_version(user.pk))
+    return found, removed
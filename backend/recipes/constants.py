@@ -6,3 +6,21 @@ MAX_MEASUREMENT_UNIT = 64
 MAX_COOKING_TIME = 43800
 MIN_AMOUNT_TIME = 1
 LINK_MAX_LENGTH = 8
+SHORT_URL_LENGTH = 7
+IMAGE_RENDITIONS = {
+    'small': (160, 160),
+    'medium': (480, 480),
+    'large': (1024, 1024),
+}
+IMAGE_RENDITION_FORMAT = 'webp'
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITION_WORKERS = 2
+SEARCH_CONFIG = 'russian'
+# Рецепты авторов с большим числом подписчиков не раскладываются
+# по лентам при публикации, а добавляются в ленту при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+# Длина имени файла в хранилище медиа: начало SHA-256 содержимого.
+MEDIA_HASH_LENGTH = 32
+MEDIA_NAME_MAX_LENGTH = 255
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow
+
+from .models import Favorites, Recipe, ShoppingCart
+
+User = get_user_model()
+
+# (модель со счетчиком, поле счетчика, считаемая модель, внешний ключ)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorites, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'following'),
+)
+
+
+def count_subquery(model, field):
+    """Количество строк model, ссылающихся на внешнюю строку через field."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def change_counters(source, objects, delta):
+    """Атомарно изменяет счетчики, зависящие от строк objects модели
+    source, на delta для каждой строки (один UPDATE на каждую
+    величину изменения)."""
+    for model, field, counted, foreign_key in COUNTERS:
+        if counted is not source:
+            continue
+        changes = {}
+        for obj in objects:
+            pk = getattr(obj, f'{foreign_key}_id')
+            changes[pk] = changes.get(pk, 0) + delta
+        pks_by_change = {}
+        for pk, change in changes.items():
+            pks_by_change.setdefault(change, []).append(pk)
+        for change, pks in pks_by_change.items():
+            model.objects.filter(pk__in=pks).update(
+                **{field: Greatest(F(field) + change, 0)}
+            )
@@ -0,0 +1,80 @@
+"""Лента подписок: материализованная таблица FeedItem.
+
+Новый рецепт раскладывается по лентам подписчиков автора, подписка
+добавляет в ленту последние рецепты автора. Рецепты авторов, у которых
+больше FEED_FANOUT_MAX_FOLLOWERS подписчиков, в таблицу не попадают
+и читаются из recipes_recipe при построении ленты.
+"""
+from itertools import islice
+
+from users.models import Follow
+
+from .constants import (FEED_BACKFILL_SIZE, FEED_FANOUT_BATCH_SIZE,
+                        FEED_FANOUT_MAX_FOLLOWERS)
+from .models import FeedItem, Recipe
+
+
+def is_fanned_out(author):
+    return author.followers_count <= FEED_FANOUT_MAX_FOLLOWERS
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if not is_fanned_out(recipe.author):
+        return
+    followers = (
+        Follow.objects.filter(following=recipe.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=FEED_FANOUT_BATCH_SIZE)
+    )
+    while True:
+        batch = [
+            FeedItem(
+                user_id=user_id, recipe=recipe, created_at=recipe.created_at
+            )
+            for user_id in islice(followers, FEED_FANOUT_BATCH_SIZE)
+        ]
+        if not batch:
+            break
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(follow):
+    """Добавляет в ленту подписчика последние рецепты автора."""
+    if not is_fanned_out(follow.following):
+        return
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=follow.user_id, recipe_id=pk, created_at=created)
+            for pk, created in (
+                Recipe.objects.filter(author=follow.following_id)
+                .order_by('-created_at', '-id')
+                .values_list('pk', 'created_at')[:FEED_BACKFILL_SIZE]
+            )
+        ],
+        ignore_conflicts=True
+    )
+
+
+def remove(follow):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedItem.objects.filter(
+        user=follow.user_id, recipe__author=follow.following_id
+    ).delete()
+
+
+def feed_sources(user):
+    """Источники ленты пользователя: пары (queryset, поле id рецепта)
+    с полем created_at. Их число не зависит от числа подписок."""
+    sources = [(FeedItem.objects.filter(user=user), 'recipe')]
+    popular_authors = list(
+        Follow.objects.filter(
+            user=user,
+            following__followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('following', flat=True)
+    )
+    if popular_authors:
+        sources.append(
+            (Recipe.objects.filter(author__in=popular_authors), 'id')
+        )
+    return sources
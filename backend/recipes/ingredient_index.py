@@ -0,0 +1,48 @@
+import bisect
+
+from .models import Ingredient
+from .versions import INGREDIENTS_VERSION, VersionedData
+
+
+class IngredientPrefixIndex(VersionedData):
+    """Индекс ингредиентов по началу названия в памяти процесса.
+
+    Строится при первом обращении и перестраивается, когда меняется
+    версия ингредиентов (см. recipes.signals).
+    """
+    version_name = INGREDIENTS_VERSION
+    empty = ((), ())
+
+    def load(self):
+        rows = sorted(
+            (name.casefold(), name, measurement_unit, pk)
+            for pk, name, measurement_unit in (
+                Ingredient.objects
+                .values_list('id', 'name', 'measurement_unit')
+                .iterator()
+            )
+        )
+        return (
+            tuple(row[0] for row in rows),
+            tuple(
+                {'id': pk, 'name': name,
+                 'measurement_unit': measurement_unit}
+                for _, name, measurement_unit, pk in rows
+            ),
+        )
+
+    def search(self, prefix, limit):
+        """Ингредиенты, название которых начинается с prefix:
+        сначала точные совпадения, затем остальные по алфавиту."""
+        keys, entries = self.get()
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(keys, prefix)
+        result = []
+        for position in range(start, min(start + limit, len(keys))):
+            if not keys[position].startswith(prefix):
+                break
+            result.append(entries[position])
+        return result
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,49 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.short_url import encode_short_url
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+
+    help = 'Заполнение коротких ссылок рецептов по первичным ключам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество рецептов в одном UPDATE'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help=('Заменить и ранее выданные ссылки '
+                  '(старые короткие ссылки перестанут работать)')
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('pk').only('pk', 'short_url')
+        if not options['all']:
+            recipes = recipes.filter(short_url__isnull=True)
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                recipes.filter(pk__gt=last_pk)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            changed = []
+            for recipe in batch:
+                short_url = encode_short_url(recipe.pk)
+                if recipe.short_url != short_url:
+                    recipe.short_url = short_url
+                    changed.append(recipe)
+            with transaction.atomic():
+                Recipe.objects.bulk_update(changed, ('short_url',))
+            updated += len(changed)
+            last_pk = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено коротких ссылок: {updated}.'
+        ))
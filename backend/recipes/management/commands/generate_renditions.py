@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from recipes.models import Recipe
+from recipes.renditions import generate_renditions, needs_renditions
+
+User = get_user_model()
+
+SOURCES = (
+    (Recipe, 'image', 'image_renditions'),
+    (User, 'avatar', 'avatar_renditions'),
+)
+
+
+class Command(BaseCommand):
+
+    help = 'Создание уменьшенных копий для уже загруженных изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии, даже если они уже есть'
+        )
+
+    def handle(self, *args, **options):
+        for model, field_name, target_name in SOURCES:
+            created = failed = 0
+            objects = (
+                model.objects.exclude(**{field_name: ''})
+                .exclude(**{f'{field_name}__isnull': True})
+                .only('pk', field_name, target_name)
+                .order_by('pk')
+            )
+            for instance in objects.iterator():
+                if not (
+                    options['force']
+                    or needs_renditions(instance, field_name, target_name)
+                ):
+                    continue
+                try:
+                    generate_renditions(
+                        model, instance.pk, field_name, target_name
+                    )
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(
+                        f'{model._meta.verbose_name} {instance.pk}: {error}'
+                    )
+                else:
+                    created += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: обработано {created}, '
+                f'ошибок {failed}.'
+            ))
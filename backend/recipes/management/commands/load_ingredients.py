@@ -0,0 +1,131 @@
+import json
+import time
+from csv import DictReader
+from itertools import islice
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+DEFAULT_PATH = 'data/ingredients.csv'
+DEFAULT_BATCH_SIZE = 1000
+JSON_READ_SIZE = 64 * 1024
+
+
+class DryRunRollback(Exception):
+    """Откатывает транзакцию пробной загрузки."""
+
+
+def read_csv(file):
+    for row in DictReader(file):
+        yield row['name'], row['measurement_unit']
+
+
+def read_json(file):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in iter(lambda: file.read(JSON_READ_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив.')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                row, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield row['name'], row['measurement_unit']
+        buffer = buffer[position:]
+    if buffer.strip():
+        raise CommandError('Некорректный JSON-файл.')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+class Command(BaseCommand):
+
+    help = 'Загрузка ингредиентов из csv- или json-файла в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_PATH,
+            help=f'Путь к файлу (по умолчанию {DEFAULT_PATH})'
+        )
+        parser.add_argument(
+            '--format', choices=tuple(READERS),
+            help='Формат файла (по умолчанию определяется по расширению)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Прочитать файл и откатить изменения'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format or path.name}.'
+            )
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size должен быть положительным.')
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                read, created = self.load(
+                    path, READERS[file_format], options['batch_size']
+                )
+                if options['dry_run']:
+                    raise DryRunRollback
+        except DryRunRollback:
+            pass
+        except FileNotFoundError:
+            raise CommandError(f'Файл {path} не найден.')
+        else:
+            ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Пробная загрузка: " if options["dry_run"] else ""}'
+            f'прочитано {read}, добавлено {created}, '
+            f'пропущено {read - created} ингредиентов '
+            f'за {time.perf_counter() - started:.2f} с.'
+        ))
+
+    def load(self, path, reader, batch_size):
+        """Загружает ингредиенты пачками, пропуская уже существующие."""
+        count_before = Ingredient.objects.count()
+        read = 0
+        with open(path, encoding='utf-8') as file:
+            rows = reader(file)
+            while True:
+                batch = [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(
+                    batch, ignore_conflicts=True
+                )
+                read += len(batch)
+        return read, Ingredient.objects.count() - count_before
@@ -0,0 +1,48 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import COUNTERS, count_subquery
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+
+    help = 'Пересчет денормализованных счетчиков рецептов и пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк, проверяемых за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        for model, field, counted, foreign_key in COUNTERS:
+            fixed = 0
+            last_pk = 0
+            while True:
+                pks = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)[:options['batch_size']]
+                )
+                if not pks:
+                    break
+                last_pk = pks[-1]
+                actual = count_subquery(counted, foreign_key)
+                with transaction.atomic():
+                    drifted = list(
+                        model.objects.filter(pk__in=pks)
+                        .annotate(actual=actual)
+                        .exclude(**{field: F('actual')})
+                        .values_list('pk', flat=True)
+                    )
+                    if drifted:
+                        model.objects.filter(pk__in=drifted).update(
+                            **{field: actual}
+                        )
+                fixed += len(drifted)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.label}.{field}: исправлено {fixed}.'
+            ))
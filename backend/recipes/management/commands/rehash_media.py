@@ -0,0 +1,130 @@
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.constants import IMAGE_RENDITIONS
+from recipes.models import MediaFile
+from recipes.storage import ContentAddressedStorage, is_hashed
+
+from .generate_renditions import SOURCES
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Переименование загруженных изображений и их копий по хешу '
+        'содержимого и пересчет ссылок на файлы. Запускать, когда '
+        'изображения не загружаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество счетчиков ссылок в одном INSERT'
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError(
+                'Хранилище медиа по умолчанию должно быть '
+                'recipes.storage.ContentAddressedStorage.'
+            )
+        renamed = {}
+        for model, field_name, target_name in SOURCES:
+            updated = failed = 0
+            for instance in self.objects(model, field_name).only(
+                'pk', field_name, target_name
+            ).iterator():
+                try:
+                    changed = self.rehash_instance(
+                        instance, field_name, target_name, renamed
+                    )
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(
+                        f'{model._meta.verbose_name} {instance.pk}: {error}'
+                    )
+                else:
+                    updated += changed
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: обновлено {updated}, '
+                f'ошибок {failed}.'
+            ))
+        # Старые файлы удаляются, только когда на них не осталось ссылок
+        # в базе.
+        for name in renamed:
+            default_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Переименовано файлов: {len(renamed)}, уникальных: '
+            f'{len(set(renamed.values()))}.'
+        ))
+        self.recount(options['batch_size'])
+
+    def objects(self, model, field_name):
+        return (
+            model.objects.exclude(**{field_name: ''})
+            .exclude(**{f'{field_name}__isnull': True})
+            .order_by('pk')
+        )
+
+    def rehash(self, name, renamed):
+        """Имя файла по содержимому; файл сохраняется под ним один раз."""
+        if is_hashed(name):
+            return name
+        if name not in renamed:
+            with default_storage.open(name, 'rb') as file:
+                renamed[name] = default_storage.save(name, file)
+        return renamed[name]
+
+    def rehash_instance(self, instance, field_name, target_name, renamed):
+        """Переименовывает изображение и его копии; save(update_fields=...)
+        обновляет версии данных для ETag и кеша ответов."""
+        file = getattr(instance, field_name)
+        renditions = getattr(instance, target_name) or {}
+        new_renditions = {
+            name: (
+                self.rehash(path, renamed) if name in IMAGE_RENDITIONS
+                else path
+            )
+            for name, path in renditions.items()
+        }
+        new_name = self.rehash(file.name, renamed)
+        if renditions.get('source') == file.name:
+            new_renditions['source'] = new_name
+        if new_name == file.name and new_renditions == renditions:
+            return False
+        file.name = new_name
+        setattr(instance, target_name, new_renditions)
+        instance.save(update_fields=(field_name, target_name))
+        return True
+
+    def recount(self, batch_size):
+        """Счетчики ссылок по изображениям и копиям, записанным в базе."""
+        references = Counter()
+        for model, field_name, target_name in SOURCES:
+            rows = self.objects(model, field_name).values_list(
+                field_name, target_name
+            )
+            for name, renditions in rows.iterator():
+                references[name] += 1
+                references.update(
+                    path for rendition, path in (renditions or {}).items()
+                    if rendition in IMAGE_RENDITIONS
+                )
+        with transaction.atomic():
+            MediaFile.objects.all().delete()
+            MediaFile.objects.bulk_create(
+                [
+                    MediaFile(name=name, references=count)
+                    for name, count in references.items()
+                ],
+                batch_size=batch_size
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Учтено ссылок: {sum(references.values())} '
+            f'на {len(references)} файлов.'
+        ))
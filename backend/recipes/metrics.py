@@ -0,0 +1,15 @@
+from prometheus_client import Counter
+
+cache_requests = Counter(
+    'foodgram_cache_requests',
+    'Обращения к кешам приложения: попадания и промахи',
+    ['cache', 'result'],
+)
+
+
+def count_cache(name, hits=0, misses=0):
+    """Учитывает попадания и промахи кеша name."""
+    if hits:
+        cache_requests.labels(name, 'hit').inc(hits)
+    if misses:
+        cache_requests.labels(name, 'miss').inc(misses)
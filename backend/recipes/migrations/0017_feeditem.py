@@ -0,0 +1,60 @@
+# Generated by Django 4.2.20 on 2026-10-17 06:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+FEED_BACKFILL_SIZE = 100
+
+
+def fill_feed(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Follow = apps.get_model('users', 'Follow')
+    follows = Follow.objects.filter(
+        following__followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('user_id', 'following_id')
+    for user_id, author_id in follows.iterator():
+        FeedItem.objects.bulk_create(
+            [
+                FeedItem(user_id=user_id, recipe_id=pk, created_at=created)
+                for pk, created in (
+                    Recipe.objects.filter(author_id=author_id)
+                    .order_by('-created_at', '-id')
+                    .values_list('pk', 'created_at')[:FEED_BACKFILL_SIZE]
+                )
+            ],
+            ignore_conflicts=True
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0016_recipe_search_vector'),
+        ('users', '0011_customuser_followers_count_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Дата публикации рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+                'default_related_name': 'feed_items',
+                'indexes': [models.Index(fields=['user', '-created_at', '-recipe'], name='feed_user_created_at_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='feed_unique_user_recipe_pair'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
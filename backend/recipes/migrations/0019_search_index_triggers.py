@@ -0,0 +1,68 @@
+from django.db import migrations
+
+FTS_TABLE = 'recipes_recipe_fts'
+SEARCH_FUNCTION = 'recipes_recipe_search_vector'
+SEARCH_TRIGGER = 'recipe_search_vector_trigger'
+FTS_TRIGGERS = {
+    'recipe_fts_insert_trigger': (
+        'AFTER INSERT ON recipes_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+    'recipe_fts_update_trigger': (
+        'AFTER UPDATE OF name, text ON recipes_recipe '
+        'WHEN old.name IS NOT new.name OR old.text IS NOT new.text BEGIN '
+        f'DELETE FROM {FTS_TABLE} WHERE rowid = old.id; '
+        f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+    'recipe_fts_delete_trigger': (
+        'AFTER DELETE ON recipes_recipe BEGIN '
+        f'DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END'
+    ),
+}
+
+
+def create_triggers(apps, schema_editor):
+    """Поисковый индекс обновляется триггерами в том же запросе,
+    что и рецепт."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE FUNCTION {SEARCH_FUNCTION}() RETURNS trigger AS $$ '
+            'BEGIN NEW.search_vector := '
+            "setweight(to_tsvector('russian', COALESCE(NEW.name, '')), 'A')"
+            " || setweight(to_tsvector('russian', COALESCE(NEW.text, '')),"
+            " 'B'); RETURN NEW; END $$ LANGUAGE plpgsql"
+        )
+        # Столбец search_vector в списке: save() записывает все столбцы,
+        # и значение из экземпляра модели заменяется вычисленным.
+        schema_editor.execute(
+            f'CREATE TRIGGER {SEARCH_TRIGGER} BEFORE INSERT OR UPDATE OF '
+            'name, text, search_vector ON recipes_recipe FOR EACH ROW '
+            f'EXECUTE FUNCTION {SEARCH_FUNCTION}()'
+        )
+    else:
+        for name, definition in FTS_TRIGGERS.items():
+            schema_editor.execute(f'CREATE TRIGGER {name} {definition}')
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'DROP TRIGGER {SEARCH_TRIGGER} ON recipes_recipe'
+        )
+        schema_editor.execute(f'DROP FUNCTION {SEARCH_FUNCTION}()')
+    else:
+        for name in FTS_TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_mediafile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -1,13 +1,18 @@
-import uuid
-
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import RowNumber
+
+from users.models import Follow
 
 from .constants import (LINK_MAX_LENGTH, MAX_COOKING_TIME,
                         MAX_INGREDIENT_AMOUNT, MAX_INGREDIENT_LENGTH,
-                        MAX_MEASUREMENT_UNIT, MIN_AMOUNT_TIME, NAME_MAX_LENGTH,
-                        TAG_MAX_LENGTH)
+                        MAX_MEASUREMENT_UNIT, MEDIA_NAME_MAX_LENGTH,
+                        MIN_AMOUNT_TIME, NAME_MAX_LENGTH, TAG_MAX_LENGTH)
+from .search import search_recipes
+from .short_url import encode_short_url
+from .versions import RECIPES_VERSION, bump_versions
 
 User = get_user_model()
 
@@ -64,6 +69,69 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_state(self, user):
+        """Аннотирует рецепты флагами текущего пользователя
+        и подгружает связанные данные для сериализации."""
+        if user.is_authenticated:
+            state = {
+                'is_favorited': models.Exists(Favorites.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )),
+                'is_in_shopping_cart': models.Exists(
+                    ShoppingCart.objects.filter(
+                        user=user, recipe=models.OuterRef('pk')
+                    )
+                ),
+                'author_is_subscribed': models.Exists(Follow.objects.filter(
+                    user=user, following=models.OuterRef('author')
+                )),
+            }
+        else:
+            state = {
+                name: models.Value(False, output_field=models.BooleanField())
+                for name in (
+                    'is_favorited', 'is_in_shopping_cart',
+                    'author_is_subscribed',
+                )
+            }
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredient_recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        ).annotate(**state)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Заполняет short_url созданных рецептов по их первичным ключам."""
+        objs = super().bulk_create(objs, *args, **kwargs)
+        missing = [obj for obj in objs if obj.pk and not obj.short_url]
+        for obj in missing:
+            obj.short_url = encode_short_url(obj.pk)
+        self.bulk_update(missing, ('short_url',))
+        bump_versions(RECIPES_VERSION)
+        return objs
+
+    def search(self, query):
+        """Полнотекстовый поиск по названию и описанию; релевантность
+        рецепта в аннотации search_rank."""
+        return search_recipes(self, query)
+
+    def limited_per_author(self, limit):
+        """Оставляет не более limit последних рецептов каждого автора."""
+        return self.annotate(
+            author_position=models.Window(
+                RowNumber(),
+                partition_by=models.F('author'),
+                order_by=(
+                    models.F('created_at').desc(), models.F('pk').desc()
+                ),
+            )
+        ).filter(author_position__lte=limit)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -98,6 +166,12 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         help_text='Добавьте фото готового блюда'
     )
+    image_renditions = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     tags = models.ManyToManyField(
         Tag,
         verbose_name='Тег рецепта',
@@ -113,6 +187,16 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
     short_url = models.CharField(
         verbose_name='Короткая ссылка',
         max_length=LINK_MAX_LENGTH,
@@ -120,6 +204,13 @@ class Recipe(models.Model):
         unique=True,
         null=True,
     )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый индекс',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-created_at',)
@@ -132,20 +223,21 @@ class Recipe(models.Model):
                 name='unique_recipe_name_author_pair'
             )
         ]
-
-    def generate_short_url(self):
-        """Функция создает короткую ссылку."""
-        return str(uuid.uuid4())[:8]
+        indexes = [
+            models.Index(
+                fields=('-created_at', '-id'),
+                name='recipe_created_at_id_idx'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         """Переопределяем метод save для генерации short_url."""
-        if not self.short_url:
-            while True:
-                short_url = self.generate_short_url()
-                if not Recipe.objects.filter(short_url=short_url).exists():
-                    self.short_url = short_url
-                    break
         super().save(*args, **kwargs)
+        if not self.short_url:
+            self.short_url = encode_short_url(self.pk)
+            Recipe.objects.filter(pk=self.pk).update(
+                short_url=self.short_url
+            )
 
     def __str__(self):
         return f'Рецепт "{self.name}" (автор: {self.author.username})'
@@ -236,3 +328,62 @@ class ShoppingCart(UserRecipeBaseModel):
                 name='shopping_cart_unique_user_recipe_pair'
             ),
         ]
+
+
+class FeedItem(models.Model):
+    """Запись ленты подписок: рецепт автора, на которого подписан user."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата публикации рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        default_related_name = 'feed_items'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='feed_unique_user_recipe_pair'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-created_at', '-recipe'),
+                name='feed_user_created_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user.username}'
+
+
+class MediaFile(models.Model):
+    """Количество ссылок на файл в хранилище медиа (recipes.storage):
+    одинаковые файлы хранятся один раз."""
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=MEDIA_NAME_MAX_LENGTH,
+        unique=True
+    )
+    references = models.PositiveIntegerField(
+        verbose_name='Количество ссылок',
+        default=1
+    )
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+        ordering = ('name',)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,126 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .constants import (IMAGE_RENDITION_FORMAT, IMAGE_RENDITION_QUALITY,
+                        IMAGE_RENDITION_WORKERS, IMAGE_RENDITIONS)
+from .storage import release_on_commit
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=IMAGE_RENDITION_WORKERS, thread_name_prefix='renditions'
+)
+
+
+def rendition_path(source, name):
+    """recipes/images/abc.jpg -> renditions/recipes/images/abc/small.webp"""
+    root, _ = posixpath.splitext(source)
+    return posixpath.join(
+        'renditions', root, f'{name}.{IMAGE_RENDITION_FORMAT}'
+    )
+
+
+def rendition_urls(instance, field_name, target_name):
+    """Ссылки на готовые уменьшенные копии текущего изображения."""
+    file = getattr(instance, field_name)
+    renditions = getattr(instance, target_name) or {}
+    if not file or renditions.get('source') != file.name:
+        return {}
+    return {
+        name: file.storage.url(path)
+        for name, path in renditions.items()
+        if name in IMAGE_RENDITIONS
+    }
+
+
+def rendition_paths(renditions):
+    """Пути к файлам копий (без ключа source)."""
+    return [
+        path for name, path in (renditions or {}).items()
+        if name in IMAGE_RENDITIONS
+    ]
+
+
+def needs_renditions(instance, field_name, target_name):
+    file = getattr(instance, field_name)
+    renditions = getattr(instance, target_name) or {}
+    return bool(file) and renditions.get('source') != file.name
+
+
+def render(image, size):
+    image = image.copy()
+    image.thumbnail(size)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer, IMAGE_RENDITION_FORMAT, quality=IMAGE_RENDITION_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def generate_renditions(model, pk, field_name, target_name):
+    """Создает уменьшенные копии изображения и сохраняет пути к ним,
+    освобождая ссылки на прежние копии в хранилище.
+
+    save(update_fields=...) вызывает post_save, поэтому версии данных
+    для ETag и кеша ответов обновляются обычным образом.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not getattr(instance, field_name):
+        return
+    file = getattr(instance, field_name)
+    storage = file.storage
+    previous = getattr(instance, target_name) or {}
+    with file.open('rb'), Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        contents = {
+            name: render(image, size)
+            for name, size in IMAGE_RENDITIONS.items()
+        }
+    # Ссылки на копии добавляются в одной транзакции с записью путей:
+    # если строку успели удалить, save() откатит и их.
+    with transaction.atomic():
+        renditions = {'source': file.name}
+        for name, content in contents.items():
+            renditions[name] = storage.save(
+                rendition_path(file.name, name), ContentFile(content)
+            )
+        setattr(instance, target_name, renditions)
+        instance.save(update_fields=(target_name,))
+        release_on_commit(rendition_paths(previous), storage)
+
+
+def try_generate_renditions(*args):
+    """generate_renditions() без исключений: запрос уже сохранил данные,
+    и ошибка копий (например, нет файла) не должна превращаться в 500."""
+    try:
+        generate_renditions(*args)
+    except Exception:
+        logger.exception('Не удалось создать копии изображения %s', args)
+
+
+def run_in_background(*args):
+    try:
+        try_generate_renditions(*args)
+    finally:
+        close_old_connections()
+
+
+def schedule_renditions(instance, field_name, target_name):
+    """Запускает генерацию копий после фиксации транзакции
+    в фоновом потоке (или сразу, если IMAGE_RENDITIONS_ASYNC выключен)."""
+    args = (type(instance), instance.pk, field_name, target_name)
+    if settings.IMAGE_RENDITIONS_ASYNC:
+        callback = partial(executor.submit, run_in_background, *args)
+    else:
+        callback = partial(try_generate_renditions, *args)
+    transaction.on_commit(callback)
@@ -0,0 +1,56 @@
+"""Полнотекстовый поиск рецептов по названию и описанию.
+
+В PostgreSQL используется столбец search_vector с GIN-индексом,
+в SQLite (DATABASE_ENGINE) — виртуальная таблица FTS5. Оба индекса
+обновляют триггеры базы в том же запросе, что и рецепт; таблицу и
+триггеры создают миграции.
+"""
+import re
+
+from django.contrib.postgres import search as postgres
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from .constants import SEARCH_CONFIG
+
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса названия и описания, как у весов A и B в PostgreSQL.
+FTS_WEIGHTS = (1.0, 0.4)
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def is_postgresql(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def fts_match(query):
+    """Запрос FTS5: все слова строки, каждое с поиском по префиксу."""
+    return ' '.join(
+        f'"{word}"*' for word in WORD_PATTERN.findall(query)
+    )
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под query, с релевантностью search_rank."""
+    if is_postgresql(queryset.db):
+        search_query = postgres.SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=postgres.SearchRank(F('search_vector'), search_query)
+        )
+    match = fts_match(query)
+    if not match:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    weights = ', '.join(map(str, FTS_WEIGHTS))
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,)
+    )).annotate(search_rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+        (match,),
+        output_field=FloatField()
+    ))
@@ -0,0 +1,46 @@
+import hashlib
+import hmac
+import string
+
+from django.conf import settings
+
+from .constants import SHORT_URL_LENGTH
+
+ALPHABET = string.digits + string.ascii_letters
+HALF_BITS = 20
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+MAX_ID = 1 << (2 * HALF_BITS)
+
+
+def round_value(number, right):
+    digest = hmac.new(
+        settings.SHORT_URL_KEY.encode(),
+        f'{number}:{right}'.encode(),
+        hashlib.sha256
+    ).digest()
+    return int.from_bytes(digest[:4], 'big') & HALF_MASK
+
+
+def permute(value):
+    """Перестановка чисел из [0, MAX_ID) на основе сети Фейстеля."""
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for number in range(ROUNDS):
+        left, right = right, left ^ round_value(number, right)
+    return (left << HALF_BITS) | right
+
+
+def encode_short_url(pk):
+    """Короткая ссылка рецепта: base62 от зашифрованного первичного ключа.
+
+    Разным ключам соответствуют разные ссылки, поэтому проверять
+    их уникальность в базе не нужно.
+    """
+    if not 0 < pk < MAX_ID:
+        raise ValueError(f'Нельзя построить короткую ссылку для id={pk}.')
+    value = permute(pk)
+    code = []
+    for _ in range(SHORT_URL_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        code.append(ALPHABET[digit])
+    return ''.join(reversed(code))
@@ -0,0 +1,178 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save, pre_save)
+from django.dispatch import receiver
+
+from users.models import Follow
+
+from . import feed
+from .counters import change_counters
+from .models import (Favorites, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag)
+from .renditions import needs_renditions, rendition_paths, schedule_renditions
+from .storage import release_on_commit
+from .versions import (INGREDIENTS_VERSION, RECIPES_VERSION, TAGS_VERSION,
+                       bump_versions, recipe_version, user_state_version)
+
+User = get_user_model()
+
+# Поле изображения и поле с путями к его копиям.
+MEDIA_FIELDS = {
+    Recipe: ('image', 'image_renditions'),
+    User: ('avatar', 'avatar_renditions'),
+}
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    bump_versions(TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    bump_versions(INGREDIENTS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipe_version(instance, **kwargs):
+    bump_versions(recipe_version(instance.pk), RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def bump_recipe_ingredients_version(instance, **kwargs):
+    bump_versions(recipe_version(instance.recipe_id), RECIPES_VERSION)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_version(instance, action, reverse, **kwargs):
+    """Изменение со стороны тега затрагивает версию всех тегов."""
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        bump_versions(TAGS_VERSION)
+    else:
+        bump_versions(recipe_version(instance.pk), RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=User)
+def bump_author_recipes_versions(instance, update_fields=None, **kwargs):
+    """Данные автора входят в ответ с рецептом."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    recipe_versions = [
+        recipe_version(pk)
+        for pk in instance.recipes.values_list('pk', flat=True)
+    ]
+    if recipe_versions:
+        bump_versions(*recipe_versions, RECIPES_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Favorites)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def bump_user_state_version(instance, **kwargs):
+    bump_versions(user_state_version(instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_image_renditions(instance, **kwargs):
+    if needs_renditions(instance, 'image', 'image_renditions'):
+        schedule_renditions(instance, 'image', 'image_renditions')
+
+
+@receiver(post_save, sender=User)
+def create_avatar_renditions(instance, **kwargs):
+    if needs_renditions(instance, 'avatar', 'avatar_renditions'):
+        schedule_renditions(instance, 'avatar', 'avatar_renditions')
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=User)
+def remember_stored_media(sender, instance, **kwargs):
+    """Имя файла, записанное в базе. Из базы поле приходит строкой;
+    отложенного поля в __dict__ нет, и ссылку тогда не освобождаем."""
+    name = instance.__dict__.get(MEDIA_FIELDS[sender][0])
+    instance._stored_media = name if isinstance(name, str) else None
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+def collect_replaced_media(sender, instance, update_fields=None, **kwargs):
+    """Файлы, на которые строка перестает ссылаться: прежнее изображение
+    (и при повторной загрузке того же файла — ссылка на него
+    добавится заново), а без изображения — его копии."""
+    field_name, target_name = MEDIA_FIELDS[sender]
+    instance._replaced_media = []
+    if instance._state.adding or (
+        update_fields is not None and field_name not in update_fields
+    ):
+        return
+    file = getattr(instance, field_name)
+    stored = getattr(instance, '_stored_media', None)
+    if stored and (stored != file.name or not file._committed):
+        instance._replaced_media.append(stored)
+    if not file and (
+        update_fields is None or target_name in update_fields
+    ):
+        instance._replaced_media.extend(
+            rendition_paths(getattr(instance, target_name))
+        )
+        setattr(instance, target_name, {})
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def release_replaced_media(sender, instance, update_fields=None, **kwargs):
+    field_name = MEDIA_FIELDS[sender][0]
+    if update_fields is not None and field_name not in update_fields:
+        return
+    file = getattr(instance, field_name)
+    release_on_commit(
+        instance.__dict__.pop('_replaced_media', ()), file.storage
+    )
+    instance._stored_media = file.name or ''
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def release_deleted_media(sender, instance, **kwargs):
+    field_name, target_name = MEDIA_FIELDS[sender]
+    file = getattr(instance, field_name)
+    release_on_commit(
+        [file.name, *rendition_paths(getattr(instance, target_name))],
+        file.storage
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+def increment_counters(sender, instance, created, **kwargs):
+    if created:
+        change_counters(sender, (instance,), 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorites)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def decrement_counters(sender, instance, **kwargs):
+    change_counters(sender, (instance,), -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(instance, created, **kwargs):
+    if created:
+        feed.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_from_feed(instance, **kwargs):
+    feed.remove(instance)
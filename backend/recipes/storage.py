@@ -0,0 +1,128 @@
+"""Хранилище медиа с именами файлов по содержимому.
+
+Файл сохраняется под именем <каталог>/<хеш содержимого>.<расширение>:
+одинаковые загрузки хранятся один раз, а по одному адресу всегда
+отдаются те же байты, поэтому ответы можно кешировать навсегда.
+Ссылки на файл считаются в MediaFile, и delete() удаляет файл, только
+когда ссылок не осталось. Ссылку добавляет сохранение загруженного файла,
+а освобождают сигналы recipes.signals, когда строка удалена или больше не
+ссылается на файл.
+"""
+import hashlib
+import os
+import posixpath
+import re
+from functools import partial
+
+from django.core.files import locks
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .constants import MEDIA_HASH_LENGTH
+from .models import MediaFile
+
+HASHED_NAME = re.compile(rf'(^|/)[0-9a-f]{{{MEDIA_HASH_LENGTH}}}\.\w+$')
+
+
+def is_hashed(name):
+    return HASHED_NAME.search(name) is not None
+
+
+def hashed_name(name, content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    return posixpath.join(
+        directory, digest.hexdigest()[:MEDIA_HASH_LENGTH] + extension
+    )
+
+
+def add_references(name, delta):
+    """Меняет счетчик ссылок; уменьшает его, только если ссылка
+    не последняя. Возвращает, была ли изменена запись."""
+    files = MediaFile.objects.filter(name=name)
+    if delta < 0:
+        files = files.filter(references__gt=-delta)
+    return files.update(references=F('references') + delta)
+
+
+def release(names, storage):
+    for name in names:
+        storage.delete(name)
+
+
+def release_on_commit(names, storage):
+    """Освобождает ссылки после фиксации транзакции: при откате строки
+    в базе по-прежнему ссылаются на эти файлы."""
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(partial(release, names, storage))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        """Имя не нужно делать уникальным: его заменит хеш содержимого."""
+        return name
+
+    def _save(self, name, content):
+        name = hashed_name(name, content)
+        # Счетчик увеличивается до проверки файла: delete() удаляет файл
+        # только под блокировкой строки с последней ссылкой. Модель
+        # сохраняется в той же транзакции, и при ошибке сохранения
+        # ссылка откатывается вместе с ней.
+        while not add_references(name, 1):
+            try:
+                with transaction.atomic():
+                    MediaFile.objects.create(name=name)
+                break
+            except IntegrityError:
+                continue
+        if not self.exists(name):
+            self.write(name, content)
+        return name
+
+    def write(self, name, content):
+        """Записывает файл, если его еще нет.
+
+        FileSystemStorage._save() при FileExistsError подбирает новое имя
+        через get_available_name(), которое здесь возвращает то же имя, и
+        повторяет попытку бесконечно. Если файл успел создать параллельный
+        запрос, в нем уже те же байты, поэтому запись не нужна.
+        """
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        try:
+            fd = os.open(full_path, self.OS_OPEN_FLAGS, 0o666)
+        except FileExistsError:
+            return
+        try:
+            locks.lock(fd, locks.LOCK_EX)
+            with os.fdopen(os.dup(fd), 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+        finally:
+            locks.unlock(fd)
+            os.close(fd)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+
+    def delete(self, name):
+        """Убирает ссылку на файл и удаляет его, если ссылок не осталось.
+        Файлы без учета ссылок (загруженные до этого хранилища)
+        удаляются сразу."""
+        if add_references(name, -1):
+            return
+        with transaction.atomic():
+            media = MediaFile.objects.select_for_update().filter(
+                name=name
+            ).first()
+            if media is not None and media.references > 1:
+                add_references(name, -1)
+                return
+            if media is not None:
+                media.delete()
+            super().delete(name)
@@ -0,0 +1,22 @@
+from .models import Tag
+from .versions import TAGS_VERSION, VersionedData
+
+
+class TagSlugMap(VersionedData):
+    """Соответствие слагов тегов их id в памяти процесса.
+
+    Перестраивается, когда меняется версия тегов (см. recipes.signals).
+    """
+    version_name = TAGS_VERSION
+    empty = {}
+
+    def load(self):
+        return dict(Tag.objects.values_list('slug', 'id'))
+
+    def ids(self, slugs):
+        """id тегов с указанными слагами; неизвестные слаги пропускаются."""
+        mapping = self.get()
+        return [mapping[slug] for slug in slugs if slug in mapping]
+
+
+tag_map = TagSlugMap()
@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from recipes.models import MediaFile, Recipe
+
+
+def image_file(color):
+    buffer = BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='image.png')
+
+
+@override_settings(IMAGE_RENDITIONS_ASYNC=False)
+class MediaReferencesTest(TestCase):
+    """Ссылки на файлы освобождаются, когда строка удалена или больше
+    не ссылается на файл."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='pass12345!'
+        )
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        override = override_settings(MEDIA_ROOT=location)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def references(self):
+        return dict(MediaFile.objects.values_list('name', 'references'))
+
+    def assertReferences(self, count):
+        """Изображение и три копии (одинаковые копии — один файл)."""
+        self.assertEqual(sum(self.references().values()), count)
+
+    def create_recipe(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                author=self.author, name='Рецепт', text='Описание',
+                cooking_time=5, image=image
+            )
+
+    def test_replaced_image_is_released(self):
+        recipe = self.create_recipe(image_file('red'))
+        old_files = set(self.references())
+        self.assertReferences(4)
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.image = image_file('blue')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save(update_fields=('image',))
+        self.assertReferences(4)
+        self.assertFalse(old_files & set(self.references()))
+        for name in old_files:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_same_image_upload_keeps_one_reference(self):
+        recipe = self.create_recipe(image_file('red'))
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.image = image_file('red')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        self.assertReferences(4)
+        self.assertTrue(default_storage.exists(recipe.image.name))
+
+    def test_deleted_recipe_is_released(self):
+        recipe = self.create_recipe(image_file('red'))
+        names = set(self.references())
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(pk=recipe.pk).delete()
+        self.assertFalse(MediaFile.objects.exists())
+        for name in names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_failed_save_rolls_back_reference(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Recipe.objects.create(
+                author=self.author, name='Рецепт', text='Описание',
+                cooking_time=None, image=image_file('red')
+            )
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_cleared_avatar_releases_renditions(self):
+        user = get_user_model().objects.get(pk=self.author.pk)
+        user.avatar = image_file('red')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertReferences(4)
+        user = get_user_model().objects.get(pk=self.author.pk)
+        user.avatar = None
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=('avatar', 'avatar_renditions'))
+        self.assertFalse(MediaFile.objects.exists())
+        user.refresh_from_db()
+        self.assertEqual(user.avatar_renditions, {})
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from recipes.models import Recipe
+from recipes.renditions import schedule_renditions
+
+
+class ScheduleRenditionsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='pass12345!'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание', cooking_time=5,
+            image='recipes/images/missing.png'
+        )
+
+    @override_settings(IMAGE_RENDITIONS_ASYNC=False)
+    def test_missing_source_is_logged(self):
+        """Ошибка синхронной генерации копий не доходит до запроса."""
+        with self.assertLogs('recipes.renditions', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_renditions(
+                    self.recipe, 'image', 'image_renditions'
+                )
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image_renditions)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TransactionTestCase
+
+from recipes.models import MediaFile
+from recipes.storage import ContentAddressedStorage, hashed_name
+
+CONTENT = b'image bytes'
+SAVE_TIMEOUT = 5
+
+
+class ContentAddressedStorageTest(TransactionTestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def save_in_thread(self, name, content):
+        """Сохраняет файл в отдельном потоке: при зацикливании тест
+        падает по таймауту, а не зависает."""
+        result = {}
+
+        def save():
+            try:
+                result['name'] = self.storage.save(name, content)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=save, daemon=True)
+        thread.start()
+        thread.join(SAVE_TIMEOUT)
+        self.assertFalse(thread.is_alive(), 'save() не завершился')
+        return result['name']
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save('images/a.png', ContentFile(CONTENT))
+        second = self.storage.save('images/b.PNG', ContentFile(CONTENT))
+        self.assertEqual(first, second)
+        self.assertEqual(MediaFile.objects.get(name=first).references, 2)
+        self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_file_created_by_concurrent_save(self):
+        """Файл появился между exists() и записью: save() возвращает
+        имя и не перезаписывает файл."""
+        content = ContentFile(CONTENT)
+        name = hashed_name('images/a.png', content)
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as file:
+            file.write(CONTENT)
+        with mock.patch.object(
+            ContentAddressedStorage, 'exists', return_value=False
+        ):
+            self.assertEqual(
+                self.save_in_thread('images/a.png', content), name
+            )
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), CONTENT)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [
+            os.path.basename(path)
+        ])
+        self.assertEqual(MediaFile.objects.get(name=name).references, 1)
@@ -0,0 +1,23 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from foodgram_backend.cache import state_cache
+from recipes.versions import get_versions, recipe_version
+
+# Больше MAX_ENTRIES по умолчанию (300), после которого FileBasedCache
+# удалял бы случайную треть записей.
+VERSIONS_COUNT = 500
+
+
+class StateCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_versions_are_not_evicted(self):
+        state_cache.set('db_pin:test', True, 60)
+        first = get_versions(recipe_version(0))
+        get_versions(*map(recipe_version, range(1, VERSIONS_COUNT)))
+        self.assertEqual(get_versions(recipe_version(0)), first)
+        self.assertIs(state_cache.get('db_pin:test'), True)
@@ -0,0 +1,107 @@
+import threading
+import time
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from foodgram_backend.cache import is_shared_cache, state_cache
+from foodgram_backend.db_router import replica_reads
+
+from .metrics import count_cache
+
+TAGS_VERSION = 'tags'
+INGREDIENTS_VERSION = 'ingredients'
+RECIPES_VERSION = 'recipes'
+
+
+def recipe_version(pk):
+    return f'recipe:{pk}'
+
+
+def user_state_version(pk):
+    """Версия избранного, списка покупок и подписок пользователя."""
+    return f'user_state:{pk}'
+
+
+def cache_key(name):
+    return f'version:{name}'
+
+
+def get_versions(*names):
+    """Текущие версии данных: время последнего изменения в наносекундах.
+
+    Для отсутствующих в кеше версий сохраняется текущее время,
+    поэтому потеря ключа приводит только к лишнему промаху валидатора.
+    """
+    keys = [cache_key(name) for name in names]
+    versions = state_cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    count_cache('versions', hits=len(versions), misses=len(missing))
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            state_cache.add(key, now, None)
+        versions.update(state_cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def set_versions(names):
+    now = time.time_ns()
+    state_cache.set_many({cache_key(name): now for name in names}, None)
+
+
+def bump_versions(*names):
+    """Обновляет версии после фиксации транзакции, чтобы параллельный
+    запрос не закешировал старые данные под новой версией."""
+    if names:
+        transaction.on_commit(partial(set_versions, names))
+
+
+class VersionedData:
+    """Данные в памяти процесса, которые строятся при первом обращении
+    и перестраиваются, когда меняется версия version_name.
+
+    Без общего кеша версия не видна другим процессам, и данные
+    строятся заново при каждом обращении.
+    """
+    version_name = None
+    empty = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = self.empty
+
+    def load(self):
+        raise NotImplementedError
+
+    def invalidate(self):
+        bump_versions(self.version_name)
+        self._version = None
+
+    def get(self):
+        if not is_shared_cache():
+            return self.load()
+        version, = get_versions(self.version_name)
+        if version == self._version:
+            count_cache(f'memory:{self.version_name}', hits=1)
+            return self._data
+        count_cache(f'memory:{self.version_name}', misses=1)
+        with self._lock:
+            if version != self._version:
+                with replica_reads(None):
+                    self._data = self.load()
+                self._version = version
+        return self._data
+
+    async def aget(self):
+        """get() для асинхронного кода: версия читается из кеша, а данные
+        перестраиваются (с запросом к базе) в отдельном потоке."""
+        if not is_shared_cache():
+            return await sync_to_async(self.load)()
+        version, = await sync_to_async(get_versions)(self.version_name)
+        if version == self._version:
+            count_cache(f'memory:{self.version_name}', hits=1)
+            return self._data
+        return await sync_to_async(self.get)()
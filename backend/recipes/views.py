@@ -1,12 +1,15 @@
-from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponseRedirect
 
 from .models import Recipe
 
 
-def recipe_redirect(request, short_url):
+async def recipe_redirect(request, short_url):
     """Перенаправление с короткой ссылки на страницу рецепта."""
-    recipe = get_object_or_404(Recipe, short_url=short_url)
+    recipe_id = await Recipe.objects.filter(
+        short_url=short_url
+    ).values_list('id', flat=True).afirst()
+    if recipe_id is None:
+        raise Http404('Рецепт не найден.')
     return HttpResponseRedirect(
-        request.build_absolute_uri(f'/recipes/{recipe.id}/')
+        request.build_absolute_uri(f'/recipes/{recipe_id}/')
     )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_customuser_followers_count_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Увеличивается при выходе и смене пароля: выданные ранее JWT перестают приниматься.', verbose_name='Версия токенов'),
+        ),
+    ]
@@ -42,6 +42,29 @@ class CustomUser(AbstractUser):
         blank=True,
         help_text='Добавьте фото профиля.'
     )
+    avatar_renditions = models.JSONField(
+        verbose_name='Уменьшенные копии фото профиля',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+    token_version = models.PositiveIntegerField(
+        verbose_name='Версия токенов',
+        default=0,
+        editable=False,
+        help_text='Увеличивается при выходе и смене пароля: выданные '
+                  'ранее JWT перестают приниматься.'
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
@@ -54,6 +77,14 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+    def refresh_from_db(self, using=None, fields=None):
+        # Пользователь из JWT (api.authentication) создается только с id:
+        # при обращении к любому полю загружаются сразу все остальные.
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CustomUser
+from .tokens import forget_token_version, revoke_tokens
+
+
+@receiver(post_save, sender=CustomUser)
+def update_token_version(instance, created, **kwargs):
+    """Смена пароля отзывает JWT, а изменение пользователя (например,
+    блокировка) сбрасывает кешированную версию."""
+    if not created and instance._password is not None:
+        revoke_tokens(instance.pk)
+    else:
+        forget_token_version(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def forget_deleted_user_version(instance, **kwargs):
+    forget_token_version(instance.pk)
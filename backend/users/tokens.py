@@ -0,0 +1,51 @@
+"""Версии токенов пользователей для JWT (api.authentication).
+
+Версия записывается в каждый выданный токен, и токен принимается, пока
+она совпадает с текущей. Текущие версии хранятся в кеше: база читается
+только при промахе, после изменения пользователя. Без общего кеша
+(foodgram_backend.cache) версия читается из базы при каждой проверке.
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from foodgram_backend.cache import is_shared_cache, state_cache
+
+# Версия удаленного или неактивного пользователя: не совпадает
+# ни с одной выданной.
+NO_VERSION = -1
+
+
+def cache_key(user_id):
+    return f'token_version:{user_id}'
+
+
+def get_token_version(user_id):
+    key = cache_key(user_id)
+    version = state_cache.get(key) if is_shared_cache() else None
+    if version is None:
+        # Из основной базы: на реплике версия могла еще не обновиться.
+        user = get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(
+            pk=user_id
+        ).values('token_version', 'is_active').first()
+        version = (
+            user['token_version'] if user and user['is_active']
+            else NO_VERSION
+        )
+        state_cache.set(key, version, None)
+    return version
+
+
+def forget_token_version(user_id):
+    """Сбрасывает кешированную версию после фиксации транзакции."""
+    transaction.on_commit(partial(state_cache.delete, cache_key(user_id)))
+
+
+def revoke_tokens(user_id):
+    """Отзывает все выданные пользователю JWT."""
+    get_user_model().objects.filter(pk=user_id).update(
+        token_version=F('token_version') + 1
+    )
+    forget_token_version(user_id)